@@ -3,9 +3,21 @@ AI-powered job matching using Claude API
 """
 import anthropic
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
 
+from . import score_cache
 
-def calculate_match_score(resume_text, job, prefs=None):
+
+SCORING_CRITERIA = """- Skills match (technical skills, tools, languages)
+- Experience level fit
+- Industry/domain alignment — weight higher if job aligns with candidate's priority keywords
+- Location preferences
+- Role responsibilities match"""
+
+
+def calculate_match_score(resume_text, job, prefs=None, timeout=None, use_cache=True):
     """
     Calculate match score (0-100) between resume and job using Claude
 
@@ -13,6 +25,8 @@ def calculate_match_score(resume_text, job, prefs=None):
         resume_text: Full text from resume
         job: Job object with title, description, requirements, etc.
         prefs: Optional SearchPreferences object for keyword/goal context
+        timeout: Optional per-request timeout in seconds
+        use_cache: Consult and fill the persistent score cache (needs an app context)
 
     Returns:
         tuple: (score: int, explanation: str) - Match score 0-100 and explanation
@@ -25,43 +39,87 @@ def calculate_match_score(resume_text, job, prefs=None):
     
     if not resume_text:
         return (50, None)
-    
+
+    cache_key = _score_cache_key(resume_text, job, prefs)
+    if use_cache:
+        cached = score_cache.lookup('score', [cache_key]).get(cache_key)
+        if cached:
+            return cached
+
+    result = _request_match_score(api_key, resume_text, job, prefs, timeout)
+    if use_cache:
+        score_cache.store('score', [(cache_key, *result)])
+    return result
+
+
+def calculate_match_scores(resume_text, jobs, prefs=None, timeout=None, use_cache=True):
+    """
+    Calculate match scores for several jobs with a single Claude request.
+
+    The resume and prefs context are sent once for the whole batch. Any job
+    whose block can't be parsed from the response is re-scored on its own;
+    if the request itself fails (timeout, rate limit, network), the batch
+    gets placeholder scores instead of one more request per job.
+
+    Args:
+        resume_text: Full text from resume
+        jobs: List of Job objects
+        prefs: Optional SearchPreferences object for keyword/goal context
+        timeout: Optional per-request timeout in seconds
+        use_cache: Consult and fill the persistent score cache (needs an app context)
+
+    Returns:
+        list: (score, explanation) tuples in the same order as jobs
+    """
+    if not jobs:
+        return []
+
+    api_key = os.getenv('CLAUDE_API_KEY')
+
+    if not api_key:
+        return [(75, None)] * len(jobs)
+
+    if not resume_text:
+        return [(50, None)] * len(jobs)
+
+    keys = [_score_cache_key(resume_text, job, prefs) for job in jobs]
+    results = [None] * len(jobs)
+    if use_cache:
+        cached = score_cache.lookup('score', keys)
+        results = [cached.get(key) for key in keys]
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if len(pending) > 1:
+        parsed = _request_batch_scores(api_key, resume_text, [jobs[i] for i in pending], prefs, timeout)
+        for number, i in enumerate(pending, 1):
+            results[i] = (75, None) if parsed is None else parsed.get(number)
+
+    fresh = []
+    for i in pending:
+        if results[i] is None:
+            results[i] = _request_match_score(api_key, resume_text, jobs[i], prefs, timeout)
+        fresh.append((keys[i], *results[i]))
+    if use_cache:
+        score_cache.store('score', fresh)
+    return results
+
+
+def _request_match_score(api_key, resume_text, job, prefs, timeout):
+    """Score one job with Claude; returns (75, None) on any failure."""
     try:
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        # Build job details
-        salary_str = f"${job.salary_min:,} - ${job.salary_max:,}" if job.salary_min and job.salary_max else 'Not specified'
-        job_details = f"""
-Job Title: {job.title}
-Company: {job.company}
-Location: {job.location or 'Not specified'}
-Salary: {salary_str}
-Description: {job.description[:1000] if job.description else 'Not provided'}
-Requirements: {job.requirements[:500] if job.requirements else 'Not provided'}
-"""
-        
-        prefs_context = ""
-        if prefs:
-            if prefs.keywords and prefs.keywords.strip():
-                prefs_context += f"\nCandidate's Priority Keywords: {prefs.keywords.strip()}"
-            if prefs.search_description and prefs.search_description.strip():
-                prefs_context += f"\nCandidate's Search Goals: {prefs.search_description.strip()}"
+        client = _create_client(api_key, timeout)
 
         prompt = f"""Analyze this job posting against the candidate's resume and provide a match score and explanation.
 
 RESUME:
 {resume_text[:3000]}
-{prefs_context}
+{_scoring_prefs_context(prefs)}
 
 JOB POSTING:
-{job_details}
+{_scoring_job_details(job)}
 
 Evaluate based on:
-- Skills match (technical skills, tools, languages)
-- Experience level fit
-- Industry/domain alignment — weight higher if job aligns with candidate's priority keywords
-- Location preferences
-- Role responsibilities match
+{SCORING_CRITERIA}
 
 Respond in this EXACT format:
 SCORE: [number 0-100]
@@ -82,26 +140,9 @@ EXPLANATION: Strong match with 5+ years Python experience and ML background alig
         
         # Parse response
         response_text = message.content[0].text.strip()
-        
-        # Extract score and explanation
-        score = 75  # Default
-        explanation = None
-        
-        lines = response_text.split('\n')
-        for i, line in enumerate(lines):
-            if line.startswith('SCORE:'):
-                score_text = line.replace('SCORE:', '').strip()
-                score = int(score_text)
-            elif line.startswith('EXPLANATION:'):
-                # Get explanation (might be multi-line)
-                explanation = line.replace('EXPLANATION:', '').strip()
-                # Add any following lines
-                for j in range(i + 1, len(lines)):
-                    if lines[j].strip():
-                        explanation += ' ' + lines[j].strip()
-        
-        # Ensure score is in range
-        score = max(0, min(100, score))
+        score, explanation = _parse_score_block(response_text)
+        if score is None:
+            score = 75  # Default
         
         return (score, explanation)
         
@@ -110,6 +151,239 @@ EXPLANATION: Strong match with 5+ years Python experience and ML background alig
         return (75, None)  # Default fallback
 
 
+def _request_batch_scores(api_key, resume_text, jobs, prefs, timeout):
+    """
+    Score several jobs with one Claude request.
+
+    Returns:
+        dict: {job_number: (score, explanation)} for the jobs that parsed,
+              numbered from 1 in list order; None on request failure
+    """
+    try:
+        client = _create_client(api_key, timeout)
+
+        postings = "\n".join(
+            f"JOB {i}\n{_scoring_job_details(job).strip()}\n"
+            for i, job in enumerate(jobs, 1)
+        )
+
+        prompt = f"""Analyze each of the following {len(jobs)} job postings against the candidate's resume and provide a match score and explanation for every one.
+
+RESUME:
+{resume_text[:3000]}
+{_scoring_prefs_context(prefs)}
+
+JOB POSTINGS:
+{postings}
+Evaluate each job independently based on:
+{SCORING_CRITERIA}
+
+Respond with one block per job, in order, in this EXACT format:
+JOB [number]
+SCORE: [number 0-100]
+EXPLANATION: [2-3 sentence explanation of why this score, highlighting key matches or gaps]
+
+Example:
+JOB 1
+SCORE: 85
+EXPLANATION: Strong match with 5+ years Python experience and ML background aligning with role requirements. Minor gap in cloud infrastructure experience but transferable skills present.
+
+JOB 2
+SCORE: 40
+EXPLANATION: Role is a senior Java position; resume shows no Java experience and a different domain focus."""
+
+        message = client.messages.create(
+            model="claude-haiku-4-5-20251001",
+            max_tokens=150 * len(jobs) + 100,
+            messages=[{"role": "user", "content": prompt}]
+        )
+
+        return _parse_batch_response(message.content[0].text, len(jobs))
+
+    except Exception as e:
+        print(f"Error calculating batch match scores: {e}")
+        return None
+
+
+def _score_cache_key(resume_text, job, prefs):
+    """Cache key over exactly the text that goes into a scoring prompt."""
+    return score_cache.make_key('score', resume_text[:3000],
+                                _scoring_prefs_context(prefs), _scoring_job_details(job))
+
+
+def _create_client(api_key, timeout=None):
+    """Build an Anthropic client, applying a request timeout if given."""
+    client_kwargs = {'api_key': api_key}
+    if timeout:
+        client_kwargs['timeout'] = timeout
+    return anthropic.Anthropic(**client_kwargs)
+
+
+def _scoring_job_details(job):
+    """Job section of the scoring prompt."""
+    salary_str = f"${job.salary_min:,} - ${job.salary_max:,}" if job.salary_min and job.salary_max else 'Not specified'
+    return f"""
+Job Title: {job.title}
+Company: {job.company}
+Location: {job.location or 'Not specified'}
+Salary: {salary_str}
+Description: {job.description[:1000] if job.description else 'Not provided'}
+Requirements: {job.requirements[:500] if job.requirements else 'Not provided'}
+"""
+
+
+def _scoring_prefs_context(prefs):
+    """Keyword/goal lines of the scoring prompt."""
+    prefs_context = ""
+    if prefs:
+        if prefs.keywords and prefs.keywords.strip():
+            prefs_context += f"\nCandidate's Priority Keywords: {prefs.keywords.strip()}"
+        if prefs.search_description and prefs.search_description.strip():
+            prefs_context += f"\nCandidate's Search Goals: {prefs.search_description.strip()}"
+    return prefs_context
+
+
+def _parse_score_block(text):
+    """
+    Parse a SCORE:/EXPLANATION: block.
+
+    Returns:
+        tuple: (score, explanation) - score is None if no valid SCORE line
+    """
+    score = None
+    explanation = None
+
+    lines = text.strip().split('\n')
+    for i, line in enumerate(lines):
+        line = line.strip().lstrip('*').strip()
+        if line.upper().startswith('SCORE:'):
+            match = re.search(r'\d+', line[len('SCORE:'):])
+            if match:
+                score = max(0, min(100, int(match.group())))
+        elif line.upper().startswith('EXPLANATION:'):
+            # Get explanation (might be multi-line)
+            explanation = line[len('EXPLANATION:'):].strip()
+            # Add any following lines
+            for j in range(i + 1, len(lines)):
+                if lines[j].strip():
+                    explanation += ' ' + lines[j].strip()
+            break
+
+    return score, explanation
+
+
+def _parse_batch_response(text, job_count):
+    """
+    Split a batched response into per-job SCORE/EXPLANATION blocks.
+
+    Returns:
+        dict: {job_number: (score, explanation)} for every block that parsed
+              cleanly; missing, duplicated or out-of-range jobs are omitted
+    """
+    markers = list(re.finditer(r'^\W*JOB\s*#?\s*(\d+)\W*$', text, re.MULTILINE | re.IGNORECASE))
+    parsed = {}
+    seen = set()
+    for idx, marker in enumerate(markers):
+        number = int(marker.group(1))
+        block_end = markers[idx + 1].start() if idx + 1 < len(markers) else len(text)
+        if number in seen or not 1 <= number <= job_count:
+            parsed.pop(number, None)
+            seen.add(number)
+            continue
+        seen.add(number)
+        score, explanation = _parse_score_block(text[marker.end():block_end])
+        if score is not None:
+            parsed[number] = (score, explanation)
+    return parsed
+
+
+def score_jobs(resume_text, jobs, prefs=None, max_workers=5, timeout=30, batch_size=1):
+    """
+    Score many jobs concurrently on a bounded thread pool.
+
+    Jobs are grouped into batches of batch_size (one Claude request each via
+    calculate_match_scores) and the batches run in parallel. Job and prefs
+    attributes are copied on the calling thread, so ORM instances never cross
+    into the worker threads.
+
+    Args:
+        resume_text: Full text from resume
+        jobs: List of Job objects to score
+        prefs: Optional SearchPreferences object
+        max_workers: Maximum number of concurrent Claude calls
+        timeout: Per-request timeout in seconds
+        batch_size: Number of jobs scored per Claude request
+
+    Returns:
+        list: (score, explanation) tuples in the same order as jobs
+    """
+    results = [(75, None)] * len(jobs)
+    if not jobs:
+        return results
+
+    # Cache reads and writes happen here on the calling thread; workers
+    # have no app context and only talk to Claude.
+    use_cache = bool(os.getenv('CLAUDE_API_KEY')) and bool(resume_text)
+    keys = [_score_cache_key(resume_text, job, prefs) for job in jobs] if use_cache else []
+    cached = score_cache.lookup('score', keys) if use_cache else {}
+    pending = []
+    for i, job in enumerate(jobs):
+        if use_cache and keys[i] in cached:
+            results[i] = cached[keys[i]]
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+
+    job_snapshots = [_snapshot_job(jobs[i]) for i in pending]
+    prefs_snapshot = _snapshot_prefs(prefs)
+    batch_size = max(1, batch_size)
+    batches = [(start, job_snapshots[start:start + batch_size])
+               for start in range(0, len(job_snapshots), batch_size)]
+    workers = max(1, min(max_workers, len(batches)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(calculate_match_scores, resume_text, batch, prefs_snapshot, timeout, False): start
+            for start, batch in batches
+        }
+        for future in as_completed(futures):
+            start = futures[future]
+            try:
+                for offset, result in enumerate(future.result()):
+                    results[pending[start + offset]] = result
+            except Exception as e:
+                print(f"Error calculating match scores: {e}")
+
+    if use_cache:
+        score_cache.store('score', [(keys[i], *results[i]) for i in pending])
+    return results
+
+
+def _snapshot_job(job):
+    """Copy the job fields used in scoring prompts into a plain object."""
+    return SimpleNamespace(
+        title=job.title,
+        company=job.company,
+        location=job.location,
+        salary_min=job.salary_min,
+        salary_max=job.salary_max,
+        description=job.description,
+        requirements=job.requirements,
+    )
+
+
+def _snapshot_prefs(prefs):
+    """Copy the prefs fields used in scoring prompts into a plain object."""
+    if prefs is None:
+        return None
+    return SimpleNamespace(
+        keywords=prefs.keywords,
+        search_description=prefs.search_description,
+        work_experience=prefs.work_experience,
+    )
+
+
 def generate_match_analysis(resume_text, job, prefs=None):
     """
     Generate a detailed, personalized match analysis for a specific job.
@@ -131,23 +405,28 @@ def generate_match_analysis(resume_text, job, prefs=None):
     if not resume_text:
         return "No resume found. Please upload your resume first."
 
-    try:
-        client = anthropic.Anthropic(api_key=api_key)
-
-        salary_str = f"${job.salary_min:,} - ${job.salary_max:,}" if job.salary_min and job.salary_max else 'Not specified'
-        job_details = f"""Job Title: {job.title}
+    salary_str = f"${job.salary_min:,} - ${job.salary_max:,}" if job.salary_min and job.salary_max else 'Not specified'
+    job_details = f"""Job Title: {job.title}
 Company: {job.company}
 Location: {job.location or 'Not specified'}
 Salary: {salary_str}
 Description: {job.description[:2000] if job.description else 'Not provided'}
 Requirements: {job.requirements[:1000] if job.requirements else 'Not provided'}"""
 
-        search_context = ""
-        if prefs:
-            if prefs.search_description:
-                search_context += f"\nCandidate's Job Search Goals: {prefs.search_description}"
-            if prefs.work_experience:
-                search_context += f"\nAdditional Work Experience Context: {prefs.work_experience}"
+    search_context = ""
+    if prefs:
+        if prefs.search_description:
+            search_context += f"\nCandidate's Job Search Goals: {prefs.search_description}"
+        if prefs.work_experience:
+            search_context += f"\nAdditional Work Experience Context: {prefs.work_experience}"
+
+    cache_key = score_cache.make_key('analysis', resume_text[:3000], search_context, job_details)
+    cached = score_cache.lookup('analysis', [cache_key]).get(cache_key)
+    if cached:
+        return cached[1]
+
+    try:
+        client = anthropic.Anthropic(api_key=api_key)
 
         prompt = f"""You are helping a job seeker understand how well a specific job matches their profile. Be honest, specific, and personal — reference actual details from their resume and the job posting.
 
@@ -172,7 +451,9 @@ Be direct and concrete. Reference actual resume details and job requirements —
             messages=[{"role": "user", "content": prompt}]
         )
 
-        return message.content[0].text.strip()
+        analysis = message.content[0].text.strip()
+        score_cache.store('analysis', [(cache_key, None, analysis)])
+        return analysis
 
     except Exception as e:
         print(f"Error generating match analysis: {e}")
@@ -0,0 +1,123 @@
+"""
+Local relevance pre-ranker
+Scores how much of the candidate's profile (job titles, priority keywords and
+resume) a posting's text covers, in process and without network calls.
+_save_jobs scores every new job with it and only sends the promising ones to
+Claude (see select()); the others keep the local score as their match score.
+
+Scoring is BM25 with the profile as the query: each profile term adds its
+weight times a saturating function of how often it occurs in the posting,
+normalised by posting length. Job titles weigh more than keywords, which
+weigh more than resume words (themselves weighted by how often the resume
+uses them), and words in the posting's title count more than in its body.
+Scores run 0-100, the share of the profile's total weight the posting covers.
+"""
+import math
+import re
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+TITLE_WEIGHT = 3.0  # profile weight of a word from the job titles
+KEYWORD_WEIGHT = 2.0  # profile weight of a priority keyword
+RESUME_TERMS = 150  # most frequent resume words kept in a profile
+JOB_TITLE_REPEAT = 3  # a posting's title words count this many times
+K1 = 1.2  # BM25 term-frequency saturation
+B = 0.75  # BM25 length normalisation
+AVERAGE_JOB_TERMS = 250  # typical posting length in terms, for length normalisation
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could do does
+etc for from get has have how i if in into is it its may more most must my no not of on
+one or other our out over per such than that the their them there these they this those
+through to up us using via was we well were what when where which while who will with
+within work working would you your years year experience ability strong including
+""".split())
+
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*')
+
+Profile = namedtuple('Profile', 'weights total')
+
+
+def tokenize(text):
+    """Lower-cased words of a text without stopwords, with plurals folded."""
+    terms = []
+    for word in _TOKEN.findall((text or '').lower()):
+        if word in STOPWORDS or (len(word) < 2 and not word.isdigit() and word not in ('c', 'r')):
+            continue
+        if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+@lru_cache(maxsize=64)
+def build_profile(resume_text, keywords='', job_titles=''):
+    """
+    Weighted query terms for a candidate. Cached, since every scrape batch
+    of a run uses the same profile.
+
+    Args:
+        resume_text: Full text from resume
+        keywords: SearchPreferences.keywords (comma-separated)
+        job_titles: SearchPreferences.job_titles (comma-separated)
+
+    Returns:
+        Profile: (weights {term: weight}, total weight)
+    """
+    weights = Counter()
+    for term, count in Counter(tokenize(resume_text)).most_common(RESUME_TERMS):
+        weights[term] += 1 + math.log(count)
+    for term in set(tokenize(keywords)):
+        weights[term] += KEYWORD_WEIGHT
+    for term in set(tokenize(job_titles)):
+        weights[term] += TITLE_WEIGHT
+    return Profile(dict(weights), sum(weights.values()))
+
+
+def profile_for(resume_text, prefs=None):
+    """build_profile() for a resume and an optional SearchPreferences."""
+    return build_profile(resume_text or '',
+                         (prefs.keywords or '') if prefs else '',
+                         (prefs.job_titles or '') if prefs else '')
+
+
+def score_job(profile, job):
+    """
+    Local relevance of a job (or job dict) to a profile.
+
+    Returns:
+        float: 0-100, rounded to one decimal
+    """
+    if not profile.total:
+        return 0.0
+
+    def field(name):
+        return job.get(name) if isinstance(job, dict) else getattr(job, name, None)
+
+    terms = tokenize(field('title')) * JOB_TITLE_REPEAT
+    terms += tokenize(field('description')) + tokenize(field('requirements'))
+    if not terms:
+        return 0.0
+    counts = Counter(terms)
+    length_norm = 1 - B + B * len(terms) / AVERAGE_JOB_TERMS
+    covered = 0.0
+    for term, weight in profile.weights.items():
+        tf = counts.get(term)
+        if tf:
+            covered += weight * tf / (tf + K1 * length_norm)
+    # tf / (tf + K1 * norm) tends to 1, so the total weight bounds the sum
+    return round(100 * covered / profile.total, 1)
+
+
+def select(scores, min_score=0, top_fraction=1.0):
+    """
+    Positions of the scores worth an AI match score: at least min_score, and
+    no more than the best top_fraction of them (rounded up).
+
+    Returns:
+        set: indices into scores
+    """
+    ranked = sorted((i for i, score in enumerate(scores) if score >= min_score),
+                    key=lambda i: scores[i], reverse=True)
+    limit = math.ceil(max(0.0, min(1.0, top_fraction)) * len(scores))
+    return set(ranked[:limit])
@@ -0,0 +1,146 @@
+"""
+Persistent cache for Claude match scores and analyses.
+
+Entries are keyed by a sha256 of the exact resume, prefs and job text that
+goes into the prompt, so re-scraping the same posting, re-running
+`flask calculate-matches` or switching back to an earlier profile reuses the
+earlier answer. The table is bounded by MATCH_CACHE_MAX_ENTRIES with
+least-recently-used eviction, checked every EVICT_EVERY stores rather than on
+each one, so it can briefly run a few batches over the limit.
+
+All functions need an app context and never commit; callers commit along
+with their own changes. Outside an app context every lookup is a miss.
+"""
+import hashlib
+import threading
+from datetime import datetime
+
+EVICT_EVERY = 50  # stores between eviction checks (each counts the whole table)
+
+_lock = threading.Lock()
+_counters = {}
+_stores = 0
+
+
+def make_key(kind, *parts):
+    """Hash the prompt inputs for one cache entry."""
+    digest = hashlib.sha256(kind.encode('utf-8'))
+    for part in parts:
+        digest.update(b'\x00')
+        digest.update((part or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def lookup(kind, keys):
+    """
+    Fetch cached entries for a list of keys in one query.
+
+    Returns:
+        dict: {key: (score, text)} for every key that was cached
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    try:
+        from models import db, MatchScoreCache
+        rows = (db.session.query(MatchScoreCache.cache_key, MatchScoreCache.score, MatchScoreCache.text)
+                .filter(MatchScoreCache.kind == kind, MatchScoreCache.cache_key.in_(keys))
+                .all())
+        found = {key: (score, text) for key, score, text in rows}
+        if found:
+            (db.session.query(MatchScoreCache)
+             .filter(MatchScoreCache.cache_key.in_(list(found)))
+             .update({MatchScoreCache.hits: MatchScoreCache.hits + 1,
+                      MatchScoreCache.last_used_at: datetime.utcnow()},
+                     synchronize_session=False))
+    except Exception as e:
+        print(f'Score cache lookup error: {e}')
+        found = {}
+    _count(kind, hits=len(found), misses=len(keys) - len(found))
+    return found
+
+
+def store(kind, entries):
+    """
+    Cache results for a list of (key, score, text) tuples.
+
+    Entries without text are placeholder/fallback results and are skipped.
+    """
+    rows = [{'cache_key': key, 'kind': kind, 'score': score, 'text': text}
+            for key, score, text in entries if text]
+    if not rows:
+        return
+    try:
+        from models import insert_or_ignore, MatchScoreCache
+        insert_or_ignore(MatchScoreCache, rows, ['cache_key'])
+        if _due_for_eviction():
+            _evict()
+    except Exception as e:
+        print(f'Score cache store error: {e}')
+
+
+def stats(table_totals=True):
+    """
+    Return hit/miss counters for this process, plus table-wide totals unless
+    table_totals is False.
+
+    Returns:
+        dict: {'kinds': {kind: {hits, misses, hit_rate}}, 'max_entries': int}
+              and, with table_totals, 'entries': int and 'lifetime_hits': int
+    """
+    with _lock:
+        kinds = {kind: dict(c, hit_rate=round(c['hits'] / (c['hits'] + c['misses']), 3)
+                            if c['hits'] + c['misses'] else 0.0)
+                 for kind, c in _counters.items()}
+    result = {'kinds': kinds, 'max_entries': _max_entries()}
+    if not table_totals:
+        return result
+    result.update(entries=0, lifetime_hits=0)
+    try:
+        from models import db, MatchScoreCache
+        entries, lifetime_hits = db.session.query(
+            db.func.count(MatchScoreCache.id),
+            db.func.coalesce(db.func.sum(MatchScoreCache.hits), 0),
+        ).one()
+        result['entries'] = entries
+        result['lifetime_hits'] = int(lifetime_hits)
+    except Exception as e:
+        print(f'Score cache stats error: {e}')
+    return result
+
+
+def _count(kind, hits=0, misses=0):
+    with _lock:
+        counter = _counters.setdefault(kind, {'hits': 0, 'misses': 0})
+        counter['hits'] += hits
+        counter['misses'] += misses
+
+
+def _max_entries():
+    try:
+        from flask import current_app
+        return current_app.config.get('MATCH_CACHE_MAX_ENTRIES', 20000)
+    except RuntimeError:
+        return 20000
+
+
+def _due_for_eviction():
+    global _stores
+    with _lock:
+        _stores += 1
+        return (_stores - 1) % EVICT_EVERY == 0  # the first store in a process, then every EVICT_EVERY
+
+
+def _evict():
+    """Drop the least recently used entries beyond MATCH_CACHE_MAX_ENTRIES."""
+    from models import db, MatchScoreCache
+    excess = MatchScoreCache.query.count() - _max_entries()
+    if excess <= 0:
+        return
+    oldest = (db.session.query(MatchScoreCache.id)
+              .order_by(MatchScoreCache.last_used_at.asc(), MatchScoreCache.id.asc())
+              .limit(excess)
+              .subquery())
+    (MatchScoreCache.query
+     .filter(MatchScoreCache.id.in_(db.select(oldest.c.id)))
+     .delete(synchronize_session=False))
@@ -1,7 +1,7 @@
 """
 Job Search Platform - Main Application
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, g, has_request_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
@@ -9,11 +9,15 @@ from flask_limiter.util import get_remote_address
 from flask_mail import Mail, Message
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from config import config
-from models import db, User, Job, Application, Interview, Resume, SearchPreferences
+from models import db, User, Job, JobPosting, PostingVector, Application, Interview, Resume, SearchPreferences, ScrapeSchedule, UserStats, bulk_insert_jobs, \
+    dismiss_postings, keyset_order, keyset_page
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
+import click
+import math
 import os
 import threading
+import time
 
 app = Flask(__name__)
 env = os.getenv('FLASK_ENV', 'development')
@@ -40,6 +44,26 @@ def load_user(user_id):
 
 # ── HELPERS ──────────────────────────────────────────────────────────────────
 
+def _request_memo(name, key, load):
+    """
+    Return load() memoised on flask.g under (name, key) for the rest of the
+    request, so the context processor and the view share one lookup. Outside
+    a request (CLI, worker threads) load() runs every time.
+    """
+    if not has_request_context():
+        return load()
+    cache = g.setdefault(name, {})
+    if key not in cache:
+        cache[key] = load()
+    return cache[key]
+
+
+def _forget_profile_lookups():
+    """Drop this request's memoised profile/resume lookups after changing them."""
+    for name in ('active_prefs', 'profile_resume', 'resume_text'):
+        g.pop(name, None)
+
+
 def _get_active_prefs(user_id=None):
     """Return the active SearchPreferences profile for a user.
     Uses current_user if in request context and no user_id given."""
@@ -51,8 +75,9 @@ def _get_active_prefs(user_id=None):
             pass  # Outside request context (CLI)
     if user_id is None:
         return None
-    return (SearchPreferences.query.filter_by(user_id=user_id, is_active=True).first()
-            or SearchPreferences.query.filter_by(user_id=user_id).first())
+    return _request_memo('active_prefs', user_id, lambda: (
+        SearchPreferences.query.filter_by(user_id=user_id, is_active=True).first()
+        or SearchPreferences.query.filter_by(user_id=user_id).first()))
 
 
 def _get_profile_resume(prefs=None):
@@ -60,17 +85,21 @@ def _get_profile_resume(prefs=None):
     if prefs is None:
         prefs = _get_active_prefs()
     if prefs:
-        resume = Resume.query.filter_by(profile_id=prefs.id).first()
-        if resume:
-            return resume
+        return _request_memo('profile_resume', prefs.id,
+                             lambda: Resume.query.filter_by(profile_id=prefs.id).first())
     return None
 
 
-def _get_resume_text():
-    """Parse and return the active profile's resume text, or None."""
-    resume = _get_profile_resume()
+def _get_resume_text(prefs=None):
+    """Parse and return the profile's (or active profile's) resume text, or None."""
+    resume = _get_profile_resume(prefs)
     if not resume:
         return None
+    return _request_memo('resume_text', resume.id, lambda: _read_resume_text(resume))
+
+
+def _read_resume_text(resume):
+    """Stored resume text, falling back to parsing the uploaded file."""
     if resume.content:
         return resume.content
     if resume.filepath and os.path.exists(resume.filepath):
@@ -82,98 +111,425 @@ def _get_resume_text():
     return None
 
 
+def _prefilter_jobs(jobs, resume_text, prefs):
+    """
+    Rank jobs locally against the profile (ai/prefilter.py) and pick the ones
+    worth a Claude match score. The others get their local score as match
+    score, so they sort to the bottom instead of sitting at the placeholder.
+    Returns the jobs to send to Claude, in their original order.
+    """
+    from ai import prefilter
+    profile = prefilter.profile_for(resume_text, prefs)
+    for job in jobs:
+        job.prefilter_score = prefilter.score_job(profile, job)
+    chosen = prefilter.select([job.prefilter_score for job in jobs],
+                              app.config['PREFILTER_MIN_SCORE'], app.config['PREFILTER_TOP_FRACTION'])
+    for i, job in enumerate(jobs):
+        if i not in chosen:
+            job.match_score = round(job.prefilter_score)
+            job.match_explanation = 'Not AI-scored: little overlap with your resume, keywords and job titles.'
+    return [job for i, job in enumerate(jobs) if i in chosen]
+
+
 def _save_jobs(jobs_data, resume_text, prefs=None, user_id=None):
     """
     Persist a list of scraped job dicts, skipping duplicates and calculating
-    AI match scores when a resume is available.
-    Returns (saved_count, duplicate_count).
+    AI match scores when a resume is available. New jobs are bulk-inserted
+    first, ranked locally, then the relevant ones are scored concurrently,
+    and everything is committed once. Jobs on a near-duplicate of a posting
+    the user already has (duplicates.py) reuse that job's score instead.
+    Returns (saved_count, duplicate_count, scored_count).
     """
-    from ai.job_matcher import calculate_match_score
-    saved = dupes = 0
-    for job_data in jobs_data:
-        try:
-            if Job.query.filter_by(
-                source=job_data['source'],
-                external_id=job_data['external_id']
-            ).first():
-                dupes += 1
-                continue
-
-            job = Job(
-                user_id=user_id,
-                source=job_data['source'],
-                external_id=job_data['external_id'],
-                url=job_data['url'],
-                title=job_data['title'],
-                company=job_data['company'],
-                location=job_data['location'],
-                salary_min=job_data.get('salary_min'),
-                salary_max=job_data.get('salary_max'),
-                description=job_data['description'],
-                requirements=job_data.get('requirements'),
-                posted_date=job_data.get('posted_date'),
-                scraped_date=datetime.utcnow(),
-                match_score=75,
-            )
-            db.session.add(job)
-            db.session.flush()
+    from ai.job_matcher import score_jobs
+    import user_stats
+    try:
+        new_jobs, dupes = bulk_insert_jobs(jobs_data, user_id=user_id, match_score=75)
+    except Exception as e:
+        print(f'Error saving jobs: {e}')
+        db.session.rollback()
+        return 0, 0, 0
 
-            if resume_text:
-                try:
-                    score, explanation = calculate_match_score(resume_text, job, prefs)
-                    job.match_score = score
-                    job.match_explanation = explanation
-                except Exception as e:
-                    print(f'Match score error: {e}')
+    # Similarity and duplicate detection are optional: each runs in a savepoint,
+    # so a failure undoes only its own writes and the new jobs still commit
+    if new_jobs and (resume_text or prefs):
+        try:
+            import similarity_index
+            with db.session.begin_nested():
+                similarity_index.score_jobs(new_jobs, resume_text, prefs)
+        except Exception as e:
+            print(f'Similarity score error: {e}')
 
-            saved += 1
+    score_sources = {}  # job id -> the user's job on a near-duplicate posting, whose score it reuses
+    if new_jobs:
+        try:
+            import duplicates
+            with db.session.begin_nested():
+                duplicates.link_postings([job.posting for job in new_jobs])
+                score_sources = duplicates.score_sources(user_id, new_jobs)
         except Exception as e:
-            print(f'Error saving job: {e}')
+            score_sources = {}
+            print(f'Duplicate detection error: {e}')
 
+    scored = 0
+    if resume_text and new_jobs:
+        try:
+            to_score = _prefilter_jobs([job for job in new_jobs if job.id not in score_sources], resume_text, prefs)
+            scores = score_jobs(resume_text, to_score, prefs,
+                                max_workers=app.config['MATCH_SCORE_WORKERS'],
+                                timeout=app.config['MATCH_SCORE_TIMEOUT'],
+                                batch_size=app.config['MATCH_SCORE_BATCH_SIZE'])
+            for job, (score, explanation) in zip(to_score, scores):
+                job.match_score = score
+                job.match_explanation = explanation
+            scored = len(to_score)
+        except Exception as e:
+            print(f'Match score error: {e}')
+    for job in new_jobs:
+        if job.id in score_sources:
+            source = score_sources[job.id]
+            job.match_score, job.match_explanation = source.match_score, source.match_explanation
+            job.prefilter_score = source.prefilter_score
+
+    user_stats.adjust(user_id, added=[user_stats.snapshot(job, status='') for job in new_jobs])
     db.session.commit()
-    return saved, dupes
+    return len(new_jobs), dupes, scored
+
+
+def _rescore_similarity(user_id):
+    """Re-rank all of a user's jobs against their active profile (similarity_index.py). Commits."""
+    try:
+        import similarity_index
+        prefs = _get_active_prefs(user_id=user_id)
+        if prefs:
+            similarity_index.rescore_user(user_id, _get_resume_text(prefs), prefs)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f'Similarity rescore error: {e}')
+
 
+def _enabled_sources():
+    """Registered scraper classes enabled by SCRAPER_SOURCES, in order."""
+    from scrapers.registry import load_sources
+    return list(load_sources(app.config['SCRAPER_SOURCES']).values())
 
-def _scrape_and_save(scraper_classes, source_label, verbose=False):
+
+def _run_scrape_pipeline(sources, job_titles, locations, resume_text, prefs, user_id,
+                         max_results=25, verbose=False, progress=None):
+    """
+    Run every source × title × location search concurrently and stream the
+    jobs into the database as they arrive: each micro-batch of
+    SCRAPE_BATCH_SIZE jobs (or whatever has arrived when a search finishes
+    or the scrapers go quiet) is deduped, inserted, scored and committed.
+    progress, if given, is called as progress('search', ...) when a search
+    finishes and progress(...) with running totals after every batch,
+    finished search and idle tick (see tasks.run_worker).
+    Searches of incremental sources start from their high-water mark and
+    advance it once they finish without error and with results. Since they
+    skip postings the search returned before (possibly for another user), up
+    to max_results of those per search, newest first, are first copied to
+    this user's jobs from the shared catalog, except postings the user deleted.
+    Returns (saved, dupes, failed_searches, total_searches).
     """
-    Orchestrate a web-triggered scrape: validate prefs, run scrapers, persist
-    results. Returns (saved, dupes, message) — saved=None signals a 400 error.
+    from models import catalog_jobs
+    from scrapers.planner import plan_scrape, stream_scrape_plan
+    from scrapers import query_state
+    marks = query_state.load_marks(query_state.query_key(cls.name, title, location)
+                                   for cls in sources if cls.supports_incremental
+                                   for title in job_titles for location in locations)
+    tasks = plan_scrape(sources, job_titles, locations, max_results=max_results, verbose=verbose, marks=marks)
+    seen = {}  # task -> [(external_id, posted_date)] for the high-water marks
+    batch_size = app.config['SCRAPE_BATCH_SIZE']
+    started = time.monotonic()
+    totals = dict(found=0, saved=0, duplicates=0, scored=0, searches_done=0, searches=len(tasks), failed=0)
+    batch = []
+
+    def flush():
+        saved, dupes, scored = _save_jobs(batch, resume_text, prefs, user_id=user_id)
+        totals['saved'] += saved
+        totals['duplicates'] += dupes
+        totals['scored'] += scored
+        batch.clear()
+
+    backfill = [job for (source, _, _), mark in marks.items()
+                for job in catalog_jobs(source, mark.known_ids, missing_for=user_id, limit=max_results)]
+    for start in range(0, len(backfill), batch_size):
+        # In micro-batches like scraped jobs, so progress (and the task heartbeat) keeps moving
+        batch.extend(backfill[start:start + batch_size])
+        totals['found'] += len(batch)
+        flush()
+        if progress:
+            progress(elapsed=round(time.monotonic() - started, 1), **totals)
+
+    for event in stream_scrape_plan(tasks, tick_seconds=app.config['SCRAPE_FLUSH_SECONDS']):
+        if event.job is not None:
+            batch.append(event.job)
+            totals['found'] += 1
+            if event.task.scraper_class.supports_incremental:
+                seen.setdefault(event.task, []).append((event.job.get('external_id'), event.job.get('posted_date')))
+        elif event.result is not None:
+            result = event.result
+            totals['searches_done'] += 1
+            totals['failed'] += bool(result.error)
+            if progress:
+                progress('search', source=result.task.source, title=result.task.keywords,
+                         location=result.task.location, found=result.found,
+                         error=str(result.error) if result.error else None,
+                         elapsed=round(result.elapsed, 1))
+        if batch and (len(batch) >= batch_size or event.job is None):
+            flush()
+        elif event.job is not None:
+            continue
+        if event.result is not None and event.task.scraper_class.supports_incremental:
+            # Jobs from this search are committed by now; move its mark past them.
+            # A failed or empty run (e.g. a blocked page) leaves the mark alone,
+            # so the next run's date window doesn't skip what this one missed.
+            jobs = seen.pop(event.task, [])
+            if not event.result.error and event.result.found:
+                query_state.record_run(query_state.query_key(event.task.source, event.task.keywords,
+                                                             event.task.location), jobs, event.result.found)
+                db.session.commit()
+        if progress:
+            progress(elapsed=round(time.monotonic() - started, 1), **totals)
+    if batch:
+        flush()
+    return totals['saved'], totals['duplicates'], totals['failed'], len(tasks)
+
+
+def _scrape_and_save(sources, source_label, user_id, prefs_id=None, verbose=False, progress=None):
+    """
+    Orchestrate a scrape for one user: validate prefs, then stream every
+    source × title × location search into the database.
+    sources is a list of registered scraper classes; prefs_id selects the
+    profile (default: the user's active one).
+    Returns (saved, dupes, message) — saved=None signals a 400 error.
     verbose=True passes through to scrapers that support it (Indeed) for full descriptions.
     """
-    prefs = _get_active_prefs()
+    prefs = SearchPreferences.query.filter_by(id=prefs_id, user_id=user_id).first() if prefs_id \
+        else _get_active_prefs(user_id=user_id)
     if not prefs or not prefs.job_titles:
         return None, None, 'Please set search preferences first (job titles required)'
 
-    resume_text = _get_resume_text()
+    resume_text = _get_resume_text(prefs)
     job_titles  = [t.strip() for t in prefs.job_titles.split(',') if t.strip()]
     locations   = prefs.get_locations_list() or ['Portland, OR']
-    user_id     = current_user.id
-
-    import inspect
-    total_saved = total_dupes = 0
-    for ScraperClass in scraper_classes:
-        for title in job_titles[:2]:
-            for location in locations:
-                scraper = ScraperClass()
-                # Only pass verbose if the scraper's scrape() method accepts it
-                sig = inspect.signature(scraper.scrape)
-                if 'verbose' in sig.parameters:
-                    jobs = scraper.scrape(keywords=title, location=location, max_results=25, verbose=verbose)
-                else:
-                    jobs = scraper.scrape(keywords=title, location=location, max_results=25)
-                if jobs:
-                    s, d = _save_jobs(jobs, resume_text, prefs, user_id=user_id)
-                    total_saved += s
-                    total_dupes += d
+
+    total_saved, total_dupes, failed, searches = _run_scrape_pipeline(
+        sources, job_titles[:2], locations, resume_text, prefs, user_id,
+        max_results=25, verbose=verbose, progress=progress)
 
     if resume_text:
         msg = f'{source_label}: {total_saved} new jobs with AI scores ({total_dupes} duplicates skipped)'
     else:
         msg = f'{source_label}: {total_saved} new jobs ({total_dupes} duplicates skipped). Upload resume for AI scores.'
+    if failed:
+        msg += f' — {failed} of {searches} searches failed'
 
     return total_saved, total_dupes, msg
 
 
+def _run_scrape_task(payload, progress):
+    """Background task handler for queued scrapes (see _queue_scrape)."""
+    from scrapers.registry import get_source
+    sources = [cls for cls in (get_source(name) for name in payload['sources']) if cls is not None]
+    if not sources:
+        raise RuntimeError('No scraper available for ' + ', '.join(payload['sources']))
+    saved, dupes, msg = _scrape_and_save(sources, payload['label'], payload['user_id'],
+                                         prefs_id=payload.get('prefs_id'),
+                                         verbose=payload.get('verbose', False), progress=progress)
+    if saved is None:
+        raise RuntimeError(msg)
+    return {'message': msg, 'saved': saved, 'duplicates': dupes}
+
+
+TASK_HANDLERS = {
+    'scrape': _run_scrape_task,
+}
+
+
+def _enqueue_scrape(user_id, prefs, sources, source_label, verbose=False):
+    """
+    Queue a scrape task for a user's profile. An all-source scrape also counts
+    as the user's periodic run, pushing their next scheduled scrape back.
+    Returns (task, created).
+    """
+    from tasks import enqueue
+    from scheduler import record_run
+    payload = {'sources': [cls.name for cls in sources], 'label': source_label,
+               'user_id': user_id, 'prefs_id': prefs.id, 'verbose': bool(verbose)}
+    task, created = enqueue('scrape', payload, user_id=user_id)
+    if created and set(payload['sources']) >= set(app.config['SCRAPER_SOURCES']) \
+            and app.config['SCRAPE_FREQUENCY_HOURS'] > 0:
+        record_run(user_id, app.config['SCRAPE_FREQUENCY_HOURS'] * 3600,
+                   app.config['SCRAPE_JITTER_MINUTES'] * 60, task_id=task.id)
+        db.session.commit()
+    if app.config['TASK_WORKER_EMBEDDED']:
+        _start_task_worker()
+    return task, created
+
+
+def _enqueue_scheduled_scrape(user_id):
+    """Scheduler callback: queue an all-source scrape, or return None if the user has no job titles."""
+    prefs = _get_active_prefs(user_id=user_id)
+    if not prefs or not prefs.job_titles:
+        return None
+    from tasks import enqueue
+    payload = {'sources': [cls.name for cls in _enabled_sources()], 'label': 'Scheduled scrape',
+               'user_id': user_id, 'prefs_id': prefs.id, 'verbose': False}
+    task, _ = enqueue('scrape', payload, user_id=user_id)
+    return task.id
+
+
+def _queue_scrape(sources, source_label, verbose=False):
+    """
+    Queue a scrape of the given scraper classes for the current user and
+    return the JSON response for it: 202 with the task id, including when
+    an identical scrape is already queued or running.
+    """
+    prefs = _get_active_prefs()
+    if not prefs or not prefs.job_titles:
+        return jsonify({'success': False, 'message': 'Please set search preferences first (job titles required)'}), 400
+
+    task, created = _enqueue_scrape(current_user.id, prefs, sources, source_label, verbose=verbose)
+    msg = f'{source_label} scrape queued' if created else f'{source_label} scrape already in progress'
+    return jsonify({'success': True, 'message': msg, 'task_id': task.id,
+                    'status': task.status, 'duplicate': not created}), 202
+
+
+def _start_task_worker():
+    """Start the embedded background worker thread(s) if not already running."""
+    from tasks import start_embedded_worker
+    start_embedded_worker(app, TASK_HANDLERS, threads=app.config['TASK_WORKER_THREADS'])
+
+
+def _start_background_threads():
+    """Start whichever of the embedded task worker and scrape scheduler are enabled."""
+    from scheduler import start_embedded_scheduler
+    if app.config['TASK_WORKER_EMBEDDED']:
+        _start_task_worker()
+    if app.config['SCHEDULER_EMBEDDED'] and app.config['SCRAPE_FREQUENCY_HOURS'] > 0:
+        start_embedded_scheduler(app, _enqueue_scheduled_scrape)
+
+
+_background_started = False
+
+
+@app.before_request
+def _start_background_once():
+    # Under `flask run` / gunicorn there is no startup hook; start on the first request.
+    # Not for the test client or requests made from inside a CLI command
+    # through app.test_client(), which would leave the threads running after
+    # the tests or command finish.
+    global _background_started
+    if app.testing or click.get_current_context(silent=True) is not None:
+        return
+    if not _background_started:
+        _background_started = True
+        _start_background_threads()
+
+
+# Job list sort orders as keyset keys: (column, nullable), all descending. Starred
+# jobs are pinned first and the id tiebreaker makes every position unique.
+# match_score counts as non-null because the list always filters on it.
+JOB_LIST_SORTS = {
+    'match':   ((Job.starred, False), (Job.match_score, False), (Job.posted_date, True), (Job.id, False)),
+    'posted':  ((Job.starred, False), (Job.posted_date, True), (Job.id, False)),
+    'scraped': ((Job.starred, False), (Job.scraped_date, False), (Job.id, False)),
+    'similar': ((Job.starred, False), (Job.similarity, True), (Job.id, False)),
+}
+
+
+def _job_list_query(user_id, min_score=0, max_score=100, location='', source='', starred_only=False,
+                    sort_by='match', q=''):
+    """
+    Filtered, sorted job list query behind the jobs page (see ix_jobs_user_starred_*
+    indexes). q keeps only jobs matching a full-text search (search_index.py);
+    sort_by='relevance' then ranks them, best match first.
+
+    Returns:
+        tuple: (query, keyset keys of its order)
+    """
+    import search_index
+    from sqlalchemy.orm import contains_eager
+    query = (Job.query
+             .join(Job.posting)
+             .options(contains_eager(Job.posting))
+             .filter(Job.user_id == user_id,
+                     Job.match_score >= min_score,
+                     Job.match_score <= max_score))
+    if location:
+        query = query.filter(JobPosting.location.like(f'%{location}%'))
+    if source:
+        query = query.filter(Job.source == source)
+    if starred_only:
+        query = query.filter(Job.starred == True)
+
+    keys = JOB_LIST_SORTS.get(sort_by, JOB_LIST_SORTS['match'])
+    if q:
+        query, relevance = search_index.search(query, q)
+        if sort_by == 'relevance' and relevance is not None:
+            keys = ((relevance, False), (Job.id, False))
+    return query.order_by(*keyset_order(keys)), keys
+
+
+def _approximate_job_total(counts, min_score, max_score, location, source, starred_only):
+    """
+    Size of the job list from the user's stats counters when the filters map
+    onto one of them (jobs still unscored are counted too), else None.
+    """
+    if location or (min_score, max_score) not in ((0, 100), (80, 100)):
+        return None
+    if min_score == 80:
+        return None if source or starred_only else counts['high_match']
+    if source and starred_only:
+        return None
+    if source:
+        return counts['by_source'].get(source, 0)
+    return counts['starred'] if starred_only else counts['total']
+
+
+def _job_stats(user_id):
+    """
+    Dashboard/analytics counters for a user from the materialised user_stats
+    rows (see user_stats.py). Memoised on flask.g for the rest of the request,
+    so a page and the context processor share one lookup.
+
+    Returns:
+        dict: total, high_match, starred, applied, interview, offer, rejected,
+              submitted and by_source {source: count}
+    """
+    import user_stats
+    return _request_memo('job_stats', user_id, lambda: user_stats.get(user_id))
+
+
+def _application_board_queries(user_id, inactive_before):
+    """One query per Kanban column on the applications page, keyed by column."""
+    from sqlalchemy.orm import contains_eager
+
+    def by_status(status):
+        # Cards show the job, so load it from the join instead of once per card
+        return (Application.query.join(Job)
+                .options(contains_eager(Application.job))
+                .filter(Job.user_id == user_id, Application.status == status))
+
+    return {
+        'not_applied':    (Job.query
+                           .filter_by(user_id=user_id)
+                           .outerjoin(Application)
+                           .filter((Application.id == None) | (Application.status == 'not_applied'))
+                           .order_by(Job.match_score.desc())),
+        'applied':        (by_status('applied')
+                           .filter(Application.applied_date > inactive_before)
+                           .order_by(Application.applied_date.desc())),
+        'inactive':       (by_status('applied')
+                           .filter(Application.applied_date <= inactive_before)
+                           .order_by(Application.applied_date.desc())),
+        'interviews':     by_status('interview').order_by(Application.applied_date.desc()),
+        'rejected':       by_status('rejected').order_by(Application.updated_at.desc()),
+        'not_interested': by_status('not_interested').order_by(Application.updated_at.desc()),
+    }
+
+
 # ── CONTEXT PROCESSOR ────────────────────────────────────────────────────────
 
 @app.context_processor
@@ -187,7 +543,7 @@ def inject_global_context():
         'has_preferences': prefs is not None and bool(prefs.job_titles),
         'resume':          resume,
         'preferences':     prefs,
-        'jobs_count':      Job.query.filter_by(user_id=current_user.id).count(),
+        'jobs_count':      _job_stats(current_user.id)['total'],
     }
 
 
@@ -328,54 +684,31 @@ def index():
     location     = request.args.get('location', '')
     source       = request.args.get('source',   '')
     starred_only = request.args.get('starred',  '')
-    page         = request.args.get('page',     1,      type=int)
-    sort_by      = request.args.get('sort_by',  'match')
-
-    query = Job.query.filter(
-        Job.user_id == current_user.id,
-        Job.match_score >= min_score,
-        Job.match_score <= max_score,
-    )
-    if location:
-        query = query.filter(Job.location.like(f'%{location}%'))
-    if source:
-        query = query.filter(Job.source == source)
-    if starred_only:
-        query = query.filter(Job.starred == True)
-
-    if sort_by == 'posted':
-        query = query.order_by(Job.starred.desc(), Job.posted_date.desc().nullslast())
-    elif sort_by == 'scraped':
-        query = query.order_by(Job.starred.desc(), Job.scraped_date.desc())
-    else:
-        query = query.order_by(Job.starred.desc(), Job.match_score.desc(), Job.posted_date.desc().nullslast())
-
-    jobs = query.paginate(page=page, per_page=app.config['JOBS_PER_PAGE'], error_out=False)
-
+    q            = request.args.get('q',        '').strip()
+    cursor       = request.args.get('cursor',   '')
+    sort_by      = request.args.get('sort_by',  'relevance' if q else 'match')
+    if sort_by not in JOB_LIST_SORTS and not (q and sort_by == 'relevance'):
+        sort_by = 'match'
+
+    per_page    = app.config['JOBS_PER_PAGE']
+    query, keys = _job_list_query(current_user.id, min_score, max_score, location, source, starred_only,
+                                  sort_by, q)
+    jobs        = keyset_page(query, keys, per_page, cursor=cursor, tag=sort_by)
+
+    counts = _job_stats(current_user.id)
+    total  = None if q else _approximate_job_total(counts, min_score, max_score, location, source, starred_only)
+    pages  = max(math.ceil(total / per_page), jobs.page) if total is not None else None
     stats = {
-        'total_jobs': Job.query.filter_by(user_id=current_user.id).count(),
-        'applied':    Application.query.join(Job).filter(
-                          Job.user_id == current_user.id,
-                          Application.status == 'applied',
-                      ).count(),
-        'interviews': Application.query.join(Job).filter(
-                          Job.user_id == current_user.id,
-                          Application.status == 'interview',
-                      ).count(),
-        'high_match': Job.query.filter(
-                          Job.user_id == current_user.id,
-                          Job.match_score >= 80,
-                      ).count(),
+        'total_jobs': counts['total'],
+        'applied':    counts['applied'],
+        'interviews': counts['interview'],
+        'high_match': counts['high_match'],
     }
+    source_stats = counts['by_source']
 
-    source_counts = (db.session.query(Job.source, db.func.count(Job.id))
-                     .filter(Job.user_id == current_user.id)
-                     .group_by(Job.source).all())
-    source_stats  = {src: cnt for src, cnt in source_counts}
-
-    return render_template('index.html', jobs=jobs, stats=stats,
+    return render_template('index.html', jobs=jobs, pages=pages, stats=stats,
                            min_score=min_score, max_score=max_score,
-                           location=location, source=source, sort_by=sort_by,
+                           location=location, source=source, sort_by=sort_by, q=q,
                            starred_only=starred_only, source_stats=source_stats)
 
 
@@ -392,39 +725,13 @@ def job_detail(job_id):
 def applications():
     three_weeks_ago = datetime.utcnow() - timedelta(weeks=3)
 
-    not_applied = (Job.query
-                   .filter_by(user_id=current_user.id)
-                   .outerjoin(Application)
-                   .filter((Application.id == None) | (Application.status == 'not_applied'))
-                   .order_by(Job.match_score.desc())
-                   .limit(200).all())
-
-    applied = (Application.query.join(Job)
-               .filter(Job.user_id == current_user.id,
-                       Application.status == 'applied',
-                       Application.applied_date > three_weeks_ago)
-               .order_by(Application.applied_date.desc()).all())
-
-    inactive = (Application.query.join(Job)
-                .filter(Job.user_id == current_user.id,
-                        Application.status == 'applied',
-                        Application.applied_date <= three_weeks_ago)
-                .order_by(Application.applied_date.desc()).all())
-
-    interviews = (Application.query.join(Job)
-                  .filter(Job.user_id == current_user.id,
-                          Application.status == 'interview')
-                  .order_by(Application.applied_date.desc()).all())
-
-    rejected = (Application.query.join(Job)
-                .filter(Job.user_id == current_user.id,
-                        Application.status == 'rejected')
-                .order_by(Application.updated_at.desc()).all())
-
-    not_interested = (Application.query.join(Job)
-                      .filter(Job.user_id == current_user.id,
-                              Application.status == 'not_interested')
-                      .order_by(Application.updated_at.desc()).all())
+    board = _application_board_queries(current_user.id, three_weeks_ago)
+    not_applied    = board['not_applied'].limit(200).all()
+    applied        = board['applied'].all()
+    inactive       = board['inactive'].all()
+    interviews     = board['interviews'].all()
+    rejected       = board['rejected'].all()
+    not_interested = board['not_interested'].all()
 
     return render_template('applications.html',
                            not_applied=not_applied, applied=applied,
@@ -436,6 +743,7 @@ def applications():
 @login_required
 def calendar():
     from calendar import monthcalendar, month_name, setfirstweekday
+    from sqlalchemy.orm import contains_eager
     setfirstweekday(6)  # 6 = Sunday, matching the Sun-Sat header order in the template
     from datetime import date
 
@@ -449,6 +757,7 @@ def calendar():
     interviews = (Interview.query
                   .join(Application)
                   .join(Job, Application.job_id == Job.id)
+                  .options(contains_eager(Interview.application).contains_eager(Application.job))
                   .filter(Job.user_id == current_user.id,
                           Interview.scheduled_date >= start_date,
                           Interview.scheduled_date < end_date)
@@ -468,6 +777,7 @@ def calendar():
     upcoming_interviews = (Interview.query
                            .join(Application)
                            .join(Job, Application.job_id == Job.id)
+                           .options(contains_eager(Interview.application).contains_eager(Application.job))
                            .filter(Job.user_id == current_user.id,
                                    Interview.scheduled_date >= now)
                            .order_by(Interview.scheduled_date)
@@ -486,20 +796,12 @@ def calendar():
 @app.route('/analytics')
 @login_required
 def analytics():
+    counts = _job_stats(current_user.id)
     stats = {
-        'viewed':     Job.query.filter_by(user_id=current_user.id).count(),
-        'applied':    Application.query.join(Job).filter(
-                          Job.user_id == current_user.id,
-                          Application.status.in_(['applied', 'interview', 'rejected', 'offer'])
-                      ).count(),
-        'interviews': Application.query.join(Job).filter(
-                          Job.user_id == current_user.id,
-                          Application.status == 'interview',
-                      ).count(),
-        'offers':     Application.query.join(Job).filter(
-                          Job.user_id == current_user.id,
-                          Application.status == 'offer',
-                      ).count(),
+        'viewed':     counts['total'],
+        'applied':    counts['submitted'],
+        'interviews': counts['interview'],
+        'offers':     counts['offer'],
     }
     return render_template('analytics.html', stats=stats)
 
@@ -559,9 +861,10 @@ def upload_resume():
     resume.uploaded_at = datetime.utcnow()
     db.session.add(resume)
     db.session.commit()
+    _forget_profile_lookups()
     resume_id = resume.id
 
-    def _parse_in_background(resume_id, filepath):
+    def _parse_in_background(resume_id, filepath, user_id):
         with app.app_context():
             try:
                 from ai.resume_parser import parse_resume
@@ -570,10 +873,11 @@ def upload_resume():
                 if r:
                     r.content = parsed_text
                     db.session.commit()
+                    _rescore_similarity(user_id)
             except Exception:
                 pass
 
-    threading.Thread(target=_parse_in_background, args=(resume_id, filepath), daemon=True).start()
+    threading.Thread(target=_parse_in_background, args=(resume_id, filepath, current_user.id), daemon=True).start()
 
     flash('Resume uploaded — extracting text in the background.', 'success')
     return redirect(url_for('settings'))
@@ -603,6 +907,9 @@ def update_preferences():
     prefs.remote_only        = data.get('remote_only', False)
     db.session.add(prefs)
     db.session.commit()
+    _forget_profile_lookups()
+    if prefs.is_active:
+        _rescore_similarity(current_user.id)
     return jsonify({'success': True, 'message': 'Preferences updated successfully', 'id': prefs.id})
 
 
@@ -620,6 +927,7 @@ def create_preferences():
     )
     db.session.add(prefs)
     db.session.commit()
+    _forget_profile_lookups()
     return jsonify({'success': True, 'id': prefs.id, 'name': prefs.name})
 
 
@@ -631,6 +939,8 @@ def activate_preferences(prefs_id):
     SearchPreferences.query.filter_by(user_id=current_user.id).update({'is_active': False})
     target.is_active = True
     db.session.commit()
+    _forget_profile_lookups()
+    _rescore_similarity(current_user.id)
     return jsonify({'success': True, 'message': f'"{target.name}" is now the active profile'})
 
 
@@ -638,8 +948,13 @@ def activate_preferences(prefs_id):
 @login_required
 @csrf.exempt
 def clear_all_jobs():
-    count = Job.query.filter_by(user_id=current_user.id).count()
+    import user_stats
+    posting_ids = [posting_id for (posting_id,) in
+                   db.session.query(Job.posting_id).filter(Job.user_id == current_user.id)]
+    count = len(posting_ids)
+    dismiss_postings(current_user.id, posting_ids)
     Job.query.filter_by(user_id=current_user.id).delete()
+    user_stats.rebuild(current_user.id)
     db.session.commit()
     return jsonify({'success': True, 'message': f'Deleted {count} jobs'})
 
@@ -648,8 +963,11 @@ def clear_all_jobs():
 @login_required
 @csrf.exempt
 def star_job(job_id):
-    job = Job.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    import user_stats
+    job    = Job.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    before = user_stats.snapshot(job)
     job.starred = not job.starred
+    user_stats.adjust(current_user.id, removed=[before], added=[user_stats.snapshot(job)])
     db.session.commit()
     return jsonify({'success': True, 'starred': job.starred})
 
@@ -658,7 +976,10 @@ def star_job(job_id):
 @login_required
 @csrf.exempt
 def delete_job(job_id):
+    import user_stats
     job = Job.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    user_stats.adjust(current_user.id, removed=[user_stats.snapshot(job)])
+    dismiss_postings(current_user.id, [job.posting_id])
     db.session.delete(job)
     db.session.commit()
     return jsonify({'success': True, 'message': 'Job deleted'})
@@ -679,6 +1000,9 @@ def delete_preferences(prefs_id):
         if fallback:
             fallback.is_active = True
     db.session.commit()
+    _forget_profile_lookups()
+    if was_active:
+        _rescore_similarity(current_user.id)
     return jsonify({'success': True, 'message': 'Profile deleted'})
 
 
@@ -686,11 +1010,14 @@ def delete_preferences(prefs_id):
 @login_required
 @csrf.exempt
 def update_application():
+    import user_stats
     data   = request.get_json()
     job_id = data.get('job_id')
-    if not Job.query.filter_by(id=job_id, user_id=current_user.id).first():
+    job    = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
         return jsonify({'success': False, 'message': 'Job not found'}), 404
 
+    before      = user_stats.snapshot(job)
     application = Application.query.filter_by(job_id=job_id).first() \
                   or Application(job_id=job_id)
     application.status           = data.get('status')
@@ -699,69 +1026,120 @@ def update_application():
     if application.status == 'applied':
         application.applied_date = datetime.utcnow()
     db.session.add(application)
+    user_stats.adjust(current_user.id, removed=[before],
+                      added=[user_stats.snapshot(job, status=application.status or '')])
     db.session.commit()
     return jsonify({'success': True, 'message': 'Application updated'})
 
 
-@app.route('/api/scrape/indeed', methods=['POST'])
+@app.route('/api/scrape/run', methods=['POST'])
 @login_required
 @csrf.exempt
-def scrape_indeed():
-    try:
-        from scrapers.indeed_playwright import IndeedPlaywrightScraper
-    except ImportError:
-        return jsonify({'success': False, 'message': 'Indeed scraper not available (Playwright not installed)'}), 400
-    verbose = (request.get_json(silent=True) or {}).get('verbose', False)
+def run_scraper():
     try:
-        saved, dupes, msg = _scrape_and_save([IndeedPlaywrightScraper], 'Indeed', verbose=verbose)
-        if saved is None:
-            return jsonify({'success': False, 'message': msg}), 400
-        return jsonify({'success': True, 'message': msg, 'saved': saved, 'duplicates': dupes})
+        return _queue_scrape(_enabled_sources(), 'All sources')
     except Exception as e:
-        return jsonify({'success': False, 'message': f'Indeed error: {str(e)}'}), 500
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 
-@app.route('/api/scrape/adzuna', methods=['POST'])
+@app.route('/api/scrape/<source>', methods=['POST'])
 @login_required
 @csrf.exempt
-def scrape_adzuna():
-    from scrapers.adzuna_api import AdzunaAPIScraper
+def scrape_source(source):
+    from scrapers.registry import get_source
+    if source not in app.config['SCRAPER_SOURCES']:
+        return jsonify({'success': False, 'message': f'Unknown job source: {source}'}), 404
+    ScraperClass = get_source(source)
+    if ScraperClass is None:
+        return jsonify({'success': False, 'message': f'{source.title()} scraper not available (missing dependencies)'}), 400
     verbose = (request.get_json(silent=True) or {}).get('verbose', False)
     try:
-        saved, dupes, msg = _scrape_and_save([AdzunaAPIScraper], 'Adzuna', verbose=verbose)
-        if saved is None:
-            return jsonify({'success': False, 'message': msg}), 400
-        return jsonify({'success': True, 'message': msg, 'saved': saved, 'duplicates': dupes})
+        return _queue_scrape([ScraperClass], ScraperClass.label, verbose=verbose)
     except Exception as e:
-        return jsonify({'success': False, 'message': f'Adzuna error: {str(e)}'}), 500
+        return jsonify({'success': False, 'message': f'{ScraperClass.label} error: {str(e)}'}), 500
 
 
-@app.route('/api/scrape/run', methods=['POST'])
+@app.route('/api/tasks/<int:task_id>', methods=['GET'])
 @login_required
 @csrf.exempt
-def run_scraper():
-    from scrapers.adzuna_api import AdzunaAPIScraper
-    scraper_classes = []
-    try:
-        from scrapers.indeed_playwright import IndeedPlaywrightScraper
-        scraper_classes.append(IndeedPlaywrightScraper)
-    except ImportError:
-        pass
-    scraper_classes.append(AdzunaAPIScraper)
-    try:
-        saved, dupes, msg = _scrape_and_save(scraper_classes, 'All sources')
-        if saved is None:
-            return jsonify({'success': False, 'message': msg}), 400
-        return jsonify({'success': True, 'message': msg, 'saved': saved, 'duplicates': dupes})
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+def task_status(task_id):
+    from tasks import get_task, task_info
+    task = get_task(task_id, user_id=current_user.id)
+    if task is None:
+        return jsonify({'success': False, 'message': 'Task not found'}), 404
+    info = task_info(task)
+    result = info['result'] or {}
+    if task.status == 'failed':
+        message = info['error']
+    else:
+        message = result.get('message') or f'Task {task.status}'
+    return jsonify({'success': True, 'message': message, **info})
+
+
+@app.route('/api/events', methods=['GET'])
+@login_required
+def task_events():
+    """
+    Server-Sent Events stream of the current user's background task progress:
+    started, search (one finished source/title/location search), progress
+    (running totals), done and failed. Events are pushed from the worker as
+    they happen; every EVENT_STREAM_KEEPALIVE_SECONDS of quiet the stream sends
+    a keepalive and checks the task table once, to pick up workers running in
+    another process.
+
+    The stream follows the tasks given as ?task=<id> (repeatable), or else
+    every task the user has queued or running, and ends once they have all
+    finished. Until then it holds a server worker, so the web server needs a
+    threaded (or gevent) worker to serve other requests alongside it.
+    """
+    import queue
+    from events import broker, format_sse
+    from tasks import task_changes, unfinished_task_ids, DONE, FAILED
+    user_id   = current_user.id
+    task_ids  = request.args.getlist('task', type=int)
+    keepalive = app.config['EVENT_STREAM_KEEPALIVE_SECONDS']
+    since     = datetime.utcnow()
+
+    def stream():
+        subscription = broker.subscribe(user_id)
+        seen = {}
+        try:
+            # Subscribed first, so a task finishing now is either still pending here or published to us
+            with app.app_context():
+                pending = unfinished_task_ids(user_id, task_ids)
+            yield 'retry: 5000\n\n'
+            while pending:
+                try:
+                    changes, quiet = [subscription.get(timeout=keepalive)], False
+                except queue.Empty:
+                    with app.app_context():
+                        changes, quiet = task_changes(user_id, seen, since), True
+                for event, data in changes:
+                    if data.get('task_id') not in pending:
+                        continue
+                    if event in (DONE, FAILED):
+                        seen[data['task_id']] = (event, None)
+                        pending.discard(data['task_id'])
+                    yield format_sse(event, data)
+                if quiet:
+                    yield ': keepalive\n\n'
+        finally:
+            broker.unsubscribe(user_id, subscription)
+
+    return app.response_class(stream(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/jobs/list', methods=['GET'])
 @login_required
 @csrf.exempt
 def list_jobs():
-    jobs = Job.query.filter_by(user_id=current_user.id).order_by(Job.scraped_date.desc()).limit(100).all()
+    q = request.args.get('q', '').strip()
+    if q:
+        query, _ = _job_list_query(current_user.id, sort_by='relevance', q=q)
+        jobs = query.limit(100).all()
+    else:
+        jobs = Job.query.filter_by(user_id=current_user.id).order_by(Job.scraped_date.desc()).limit(100).all()
     return jsonify([{'id': j.id, 'title': j.title, 'company': j.company} for j in jobs])
 
 
@@ -769,15 +1147,18 @@ def list_jobs():
 @login_required
 @csrf.exempt
 def schedule_interview():
+    import user_stats
     data           = request.get_json()
     job_id         = data.get('job_id')
     scheduled_date = data.get('scheduled_date')
     interview_type = data.get('interview_type', 'phone')
     notes          = data.get('notes', '')
 
-    if not Job.query.filter_by(id=job_id, user_id=current_user.id).first():
+    job = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
         return jsonify({'success': False, 'message': 'Job not found'}), 404
 
+    before      = user_stats.snapshot(job)
     application = Application.query.filter_by(job_id=job_id).first()
     if not application:
         application = Application(job_id=job_id, status='interview')
@@ -800,6 +1181,8 @@ def schedule_interview():
         interview_type=interview_type,
         notes=notes,
     ))
+    user_stats.adjust(current_user.id, removed=[before],
+                      added=[user_stats.snapshot(job, status=application.status)])
     db.session.commit()
     return jsonify({'success': True, 'message': 'Interview scheduled'})
 
@@ -869,6 +1252,7 @@ def generate_match_analysis_api(job_id):
         prefs = _get_active_prefs()
         from ai.job_matcher import generate_match_analysis
         analysis = generate_match_analysis(resume_text, job, prefs)
+        db.session.commit()  # persist score cache updates
 
         return jsonify({'success': True, 'analysis': analysis})
     except Exception as e:
@@ -876,12 +1260,23 @@ def generate_match_analysis_api(job_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+@login_required
+def cache_stats_api():
+    # Only this process's hit/miss counters; table-wide totals are for `flask cache-stats`
+    from ai.score_cache import stats
+    return jsonify({'success': True, **stats(table_totals=False)})
+
+
 # ── CLI COMMANDS ─────────────────────────────────────────────────────────────
 
 @app.cli.command()
 def calculate_matches():
     """Calculate AI match scores for all unscored jobs (all users)."""
-    from ai.job_matcher import calculate_match_score
+    from ai.job_matcher import score_jobs
+    import user_stats
+    batch_size = app.config['MATCH_SCORE_BATCH_SIZE']
+    chunk_size = batch_size * app.config['MATCH_SCORE_WORKERS']
     users = User.query.all()
     for user in users:
         prefs = _get_active_prefs(user_id=user.id)
@@ -892,44 +1287,180 @@ def calculate_matches():
         if not resume or not resume.content:
             print(f'[{user.username}] No resume, skipping')
             continue
-        jobs = Job.query.filter(
-            Job.user_id == user.id,
-            (Job.match_score == None) | (Job.match_score == 75),
-        ).all()
+        # Placeholder and failed scores carry no explanation; a genuine (or
+        # locally ranked) score of 75 does, so select on that, not the value
+        jobs = Job.query.filter(Job.user_id == user.id, Job.match_explanation == None).all()
         print(f'[{user.username}] Scoring {len(jobs)} jobs...')
-        updated = 0
-        for i, job in enumerate(jobs, 1):
+        updated = skipped = 0
+        for start in range(0, len(jobs), chunk_size):
+            chunk = jobs[start:start + chunk_size]
             try:
-                job.match_score, job.match_explanation = calculate_match_score(resume.content, job, prefs)
-                updated += 1
-                if i % 5 == 0:
-                    print(f'  {i}/{len(jobs)}...')
-                    db.session.commit()
+                before = [user_stats.snapshot(job, status='') for job in chunk]
+                to_score = _prefilter_jobs(chunk, resume.content, prefs)
+                scores = score_jobs(resume.content, to_score, prefs,
+                                    max_workers=app.config['MATCH_SCORE_WORKERS'],
+                                    timeout=app.config['MATCH_SCORE_TIMEOUT'],
+                                    batch_size=batch_size)
+                for job, (score, explanation) in zip(to_score, scores):
+                    job.match_score, job.match_explanation = score, explanation
+                user_stats.adjust(user.id, removed=before,
+                                  added=[user_stats.snapshot(job, status='') for job in chunk])
+                updated += len(to_score)
+                skipped += len(chunk) - len(to_score)
+                db.session.commit()
+                print(f'  {start + len(chunk)}/{len(jobs)}...')
             except Exception as e:
-                print(f'  Error scoring job {job.id}: {e}')
+                db.session.rollback()
+                print(f'  Error scoring jobs {start + 1}-{start + len(chunk)}: {e}')
+        print(f'[{user.username}] Updated {updated} scores ({skipped} ranked locally only).')
+
+
+@app.cli.command()
+def cache_stats():
+    """Show match score cache size and hit/miss counters."""
+    from ai.score_cache import stats
+    result = stats()
+    print(f"Entries: {result['entries']}/{result['max_entries']}")
+    print(f"Lifetime hits: {result['lifetime_hits']}")
+    for kind, counter in result['kinds'].items():
+        print(f"  {kind}: {counter['hits']} hits, {counter['misses']} misses ({counter['hit_rate']:.0%} hit rate)")
+
+
+@app.cli.command()
+@click.option('--threads', default=1, show_default=True, help='Worker threads in this process.')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+def run_worker(threads, once):
+    """Run background tasks (queued scrapes) until interrupted."""
+    from tasks import run_worker as _run_worker
+    print(f'Task worker started with {threads} thread(s). Ctrl+C to stop.')
+    stop = threading.Event()
+    workers = [threading.Thread(target=_run_worker, args=(app, TASK_HANDLERS, stop),
+                                kwargs={'once': once}, name=f'task-worker-{n}')
+               for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+    except KeyboardInterrupt:
+        print('Stopping after current tasks...')
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+@app.cli.command()
+def run_scheduler():
+    """Queue periodic scrapes every SCRAPE_FREQUENCY_HOURS, staggered across users."""
+    from scheduler import run_scheduler as _run_scheduler
+    if app.config['SCRAPE_FREQUENCY_HOURS'] <= 0:
+        print('SCRAPE_FREQUENCY_HOURS is 0; nothing to schedule.')
+        return
+    print(f"Scheduler started: every {app.config['SCRAPE_FREQUENCY_HOURS']}h per user, "
+          f"±{app.config['SCRAPE_JITTER_MINUTES']}m jitter. Ctrl+C to stop.")
+    try:
+        _run_scheduler(app, _enqueue_scheduled_scrape)
+    except KeyboardInterrupt:
+        print('Scheduler stopped.')
+
+
+@app.cli.command()
+def schedule_status():
+    """Show each user's last and next scheduled scrape."""
+    rows = (db.session.query(User.username, ScrapeSchedule.last_run_at, ScrapeSchedule.next_run_at)
+            .outerjoin(ScrapeSchedule, ScrapeSchedule.user_id == User.id)
+            .order_by(ScrapeSchedule.next_run_at)
+            .all())
+    for username, last_run_at, next_run_at in rows:
+        print(f'{username:20} last {last_run_at or "never"}  next {next_run_at or "unscheduled"}')
+
+
+@app.cli.command()
+def rebuild_stats():
+    """Recompute every user's dashboard counters from the jobs table."""
+    import user_stats
+    for user in User.query.all():
+        before = db.session.get(UserStats, user.id)
+        before = {key: getattr(before, key) for key in user_stats.COUNTERS} if before else None
+        totals, _ = user_stats.rebuild(user.id)
         db.session.commit()
-        print(f'[{user.username}] Updated {updated} scores.')
+        if before is None:
+            print(f'[{user.username}] Built: {totals["total"]} jobs')
+        elif before != totals:
+            drift = {key: totals[key] - before[key] for key in totals if totals[key] != before[key]}
+            print(f'[{user.username}] Repaired drift: {drift}')
+        else:
+            print(f'[{user.username}] OK ({totals["total"]} jobs)')
+
+
+@app.cli.command()
+@click.option('--user', 'username', default=None, help='Only rescore this user (default: everyone)')
+@click.option('--reindex', is_flag=True, help='Recompute every posting vector first (e.g. after changing DIMENSIONS)')
+def rescore_similarity(username, reindex):
+    """Embed postings and re-rank every user's jobs by similarity to their active profile."""
+    import similarity_index
+    started = time.monotonic()
+    if reindex:
+        deleted = PostingVector.query.delete(synchronize_session=False)
+        db.session.commit()
+        print(f'Dropped {deleted} posting vectors')
+    embedded = 0
+    while True:
+        count = similarity_index.index_missing()
+        db.session.commit()
+        if not count:
+            break
+        embedded += count
+    print(f'Embedded {embedded} postings ({time.monotonic() - started:.1f}s)')
+
+    users = User.query.filter_by(username=username).all() if username else User.query.all()
+    for user in users:
+        prefs = _get_active_prefs(user_id=user.id)
+        if not prefs:
+            print(f'[{user.username}] No preferences, skipping')
+            continue
+        count = similarity_index.rescore_user(user.id, _get_resume_text(prefs), prefs)
+        db.session.commit()
+        print(f'[{user.username}] Rescored {count} jobs')
+    print(f'Done in {time.monotonic() - started:.1f}s')
+
+
+@app.cli.command()
+def dedupe_postings():
+    """Find near-duplicate postings among those stored before duplicate detection ran."""
+    import duplicates
+    started = time.monotonic()
+    indexed = linked = 0
+    while True:
+        count, found = duplicates.index_missing()
+        db.session.commit()
+        if not count:
+            break
+        indexed += count
+        linked += found
+        print(f'  {indexed} postings indexed, {linked} duplicates linked...')
+    print(f'Indexed {indexed} postings and linked {linked} duplicates in {time.monotonic() - started:.1f}s')
 
 
 @app.cli.command()
 def init_db():
     """Initialize the database."""
+    import search_index
     db.create_all()
+    search_index.ensure()
     print('Database initialized.')
 
 
 @app.cli.command()
 def scrape_jobs():
     """Run job scrapers from the command line (all users with active prefs)."""
-    from scrapers.adzuna_api import AdzunaAPIScraper
-    scraper_classes = []
-    try:
-        from scrapers.indeed_playwright import IndeedPlaywrightScraper
-        scraper_classes.append(('Indeed', IndeedPlaywrightScraper))
-        print('Indeed scraper available')
-    except ImportError:
-        print('Indeed scraper not available (Playwright not installed)')
-    scraper_classes.append(('Adzuna', AdzunaAPIScraper))
+    from scrapers.registry import unavailable_sources
+    from scheduler import record_run
+    sources = _enabled_sources()
+    print(f'Sources: {", ".join(cls.label for cls in sources)}')
+    for module, error in unavailable_sources().items():
+        print(f'Unavailable: {module} ({error})')
 
     users = User.query.all()
     for user in users:
@@ -945,22 +1476,15 @@ def scrape_jobs():
         job_titles = [t.strip() for t in prefs.job_titles.split(',') if t.strip()]
         locations  = prefs.get_locations_list() or ['Portland, OR']
 
-        total_saved = total_dupes = 0
-        for name, ScraperClass in scraper_classes:
-            print(f'  --- {name} ---')
-            for title in job_titles:
-                for location in locations:
-                    try:
-                        jobs = ScraperClass().scrape(keywords=title, location=location, max_results=50)
-                        if jobs:
-                            s, d = _save_jobs(jobs, resume_text, prefs, user_id=user.id)
-                            total_saved += s
-                            total_dupes += d
-                            print(f'    {title} / {location}: {s} saved, {d} dupes')
-                    except Exception as e:
-                        print(f'    Error: {e}')
+        print(f'  Running {len(sources) * len(job_titles) * len(locations)} searches...')
+        total_saved, total_dupes, failed, _ = _run_scrape_pipeline(
+            sources, job_titles, locations, resume_text, prefs, user.id, max_results=50)
+
+        if app.config['SCRAPE_FREQUENCY_HOURS'] > 0:
+            record_run(user.id, app.config['SCRAPE_FREQUENCY_HOURS'] * 3600, app.config['SCRAPE_JITTER_MINUTES'] * 60)
+            db.session.commit()
 
-        print(f'[{user.username}] Done. {total_saved} saved, {total_dupes} duplicates skipped.')
+        print(f'[{user.username}] Done. {total_saved} saved, {total_dupes} duplicates skipped, {failed} searches failed.')
 
 
 # ── STARTUP ──────────────────────────────────────────────────────────────────
@@ -968,4 +1492,7 @@ def scrape_jobs():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+    # Only in the reloader's child process, which is the one serving requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        _start_background_threads()
     app.run(debug=True, host='0.0.0.0', port=3003)
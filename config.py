@@ -24,8 +24,30 @@ class Config:
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
 
     # Scraping settings
-    SCRAPE_FREQUENCY_HOURS = int(os.getenv('SCRAPE_FREQUENCY_HOURS', 24))
+    SCRAPE_FREQUENCY_HOURS = int(os.getenv('SCRAPE_FREQUENCY_HOURS', 24))  # per-user scheduled scrape; 0 disables
     MAX_JOBS_PER_BOARD = int(os.getenv('MAX_JOBS_PER_BOARD', 50))
+    SCRAPE_BATCH_SIZE = int(os.getenv('SCRAPE_BATCH_SIZE', 10))  # jobs saved + scored per commit while scraping
+    SCRAPE_FLUSH_SECONDS = float(os.getenv('SCRAPE_FLUSH_SECONDS', 3))  # commit a partial batch after this much quiet
+    SCRAPE_JITTER_MINUTES = int(os.getenv('SCRAPE_JITTER_MINUTES', 10))  # random offset of each scheduled scrape
+    SCHEDULER_EMBEDDED = os.getenv('SCHEDULER_EMBEDDED', 'True') == 'True'  # run the scheduler in the web process
+    SCHEDULER_INTERVAL_SECONDS = int(os.getenv('SCHEDULER_INTERVAL_SECONDS', 60))  # how often to look for due users
+
+    # Background tasks (see tasks.py)
+    TASK_WORKER_EMBEDDED = os.getenv('TASK_WORKER_EMBEDDED', 'True') == 'True'  # run a worker thread in the web process
+    TASK_WORKER_THREADS = int(os.getenv('TASK_WORKER_THREADS', 1))  # embedded worker threads
+    TASK_STALE_SECONDS = int(os.getenv('TASK_STALE_SECONDS', 300))  # requeue running tasks silent this long
+    EVENT_STREAM_KEEPALIVE_SECONDS = int(os.getenv('EVENT_STREAM_KEEPALIVE_SECONDS', 15))  # SSE keepalive / cross-process check
+
+    # Enabled job sources, in scrape order (see scrapers/registry.py)
+    SCRAPER_SOURCES = [s.strip() for s in os.getenv('SCRAPER_SOURCES', 'indeed,adzuna').split(',') if s.strip()]
+
+    # AI match scoring
+    MATCH_SCORE_WORKERS = int(os.getenv('MATCH_SCORE_WORKERS', 5))  # concurrent Claude calls per scrape
+    MATCH_SCORE_TIMEOUT = int(os.getenv('MATCH_SCORE_TIMEOUT', 30))  # seconds per Claude call
+    MATCH_SCORE_BATCH_SIZE = int(os.getenv('MATCH_SCORE_BATCH_SIZE', 8))  # jobs scored per Claude call
+    PREFILTER_MIN_SCORE = float(os.getenv('PREFILTER_MIN_SCORE', 5))  # local relevance needed for an AI score; 0 sends all
+    PREFILTER_TOP_FRACTION = float(os.getenv('PREFILTER_TOP_FRACTION', 1.0))  # share of each batch sent to Claude, best first
+    MATCH_CACHE_MAX_ENTRIES = int(os.getenv('MATCH_CACHE_MAX_ENTRIES', 20000))  # LRU-evicted beyond this
     
     # Application settings
     JOBS_PER_PAGE = int(os.getenv('JOBS_PER_PAGE', 20))
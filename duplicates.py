@@ -0,0 +1,191 @@
+"""
+Near-duplicate posting detection
+The same job often comes back from several boards (or is reposted) under a
+different external id. Each new posting's normalised title, company and
+description is cut into word shingles and summarised by a MinHash signature
+(posting_minhashes). The signature is split into LSH bands (posting_bands),
+so finding candidates is an indexed lookup of the posting's bands rather
+than a comparison against every stored posting. Candidates whose estimated
+Jaccard similarity reaches DUPLICATE_THRESHOLD are duplicates, and the
+posting is linked to the group's earliest posting (JobPosting.canonical_id).
+
+_save_jobs links postings as they arrive and copies a duplicate's match
+score from the user's other job in the same group instead of asking Claude
+again. `flask dedupe-postings` indexes postings stored before this existed.
+Functions need an app context and never commit.
+"""
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+SHINGLE_WORDS = 3  # words per shingle
+PERMUTATIONS = 128  # MinHash signature length
+BANDS = 16  # LSH bands of PERMUTATIONS // BANDS rows: pairs above ~0.7 similarity usually share one
+ROWS = PERMUTATIONS // BANDS
+DUPLICATE_THRESHOLD = 0.8  # estimated Jaccard similarity of shingles to count as a duplicate
+MIN_SHINGLES = 8  # postings with less text are signed but never matched
+
+
+def _permutation(i):
+    digest = hashlib.blake2b(f'minhash-{i}'.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'big') | 1, int.from_bytes(digest[8:], 'big')
+
+
+# Multiply-shift hash functions (a * x + b) >> 32 over wrapping 64-bit
+# arithmetic, fixed so signatures stay comparable across runs
+_A, _B = (np.array(values, dtype=np.uint64).reshape(-1, 1)
+          for values in zip(*(_permutation(i) for i in range(PERMUTATIONS))))
+_SHIFT = np.uint64(32)
+
+
+def shingles(posting):
+    """Set of hashed word shingles of a posting's title, company and description."""
+    text = ' '.join(part or '' for part in (posting.title, posting.company, posting.description))
+    words = re.sub(r'[^a-z0-9]+', ' ', text.lower()).split()
+    if len(words) <= SHINGLE_WORDS:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = (' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams}
+
+
+def signature(hashed_shingles):
+    """MinHash signature (PERMUTATIONS uint32 values) of a set of hashed shingles."""
+    if not hashed_shingles:
+        return np.full(PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+    values = np.fromiter(hashed_shingles, dtype=np.uint64, count=len(hashed_shingles))
+    return ((_A * values + _B) >> _SHIFT).min(axis=1).astype(np.uint32)
+
+
+def band_hashes(sig):
+    """One signed 64-bit key per LSH band of a signature."""
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes(),
+                                           digest_size=8).digest(), 'big', signed=True)
+            for band in range(BANDS)]
+
+
+def similarity(sig, others):
+    """Estimated Jaccard similarity of a signature to each row of others."""
+    return (np.asarray(others) == sig).mean(axis=1)
+
+
+def link_postings(postings, chunk_size=500):
+    """
+    Sign, band and link postings not indexed yet, earliest first, so a
+    posting can also match one earlier in the same list. Already indexed
+    postings are skipped.
+
+    Returns:
+        int: number of postings linked to an earlier duplicate
+    """
+    from models import db, JobPosting, PostingMinHash, PostingBand, insert_or_ignore
+    postings = sorted({posting.id: posting for posting in postings}.values(), key=lambda posting: posting.id)
+    ids = [posting.id for posting in postings]
+    indexed = set()
+    for start in range(0, len(ids), chunk_size):
+        indexed.update(posting_id for (posting_id,) in db.session.query(PostingMinHash.posting_id)
+                       .filter(PostingMinHash.posting_id.in_(ids[start:start + chunk_size])))
+    postings = [posting for posting in postings if posting.id not in indexed]
+    if not postings:
+        return 0
+
+    signatures, bands = {}, {}
+    for posting in postings:
+        hashed = shingles(posting)
+        signatures[posting.id] = signature(hashed)
+        if len(hashed) >= MIN_SHINGLES:
+            bands[posting.id] = band_hashes(signatures[posting.id])
+
+    # Stored postings sharing a band with any of the new ones
+    buckets = defaultdict(set)
+    keys = list({key for keys in bands.values() for key in keys})
+    for start in range(0, len(keys), chunk_size):
+        for band_hash, posting_id in (db.session.query(PostingBand.band_hash, PostingBand.posting_id)
+                                      .filter(PostingBand.band_hash.in_(keys[start:start + chunk_size]))):
+            buckets[band_hash].add(posting_id)
+    candidates = list({posting_id for members in buckets.values() for posting_id in members})
+    known, canonical = {}, {}
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        for posting_id, blob, canonical_id in (db.session.query(PostingMinHash.posting_id, PostingMinHash.signature,
+                                                                JobPosting.canonical_id)
+                                               .join(JobPosting, JobPosting.id == PostingMinHash.posting_id)
+                                               .filter(PostingMinHash.posting_id.in_(chunk))):
+            known[posting_id] = np.frombuffer(blob, dtype=np.uint32)
+            canonical[posting_id] = canonical_id or posting_id
+
+    linked = 0
+    for posting in postings:
+        if posting.id in bands:
+            matches = sorted({other for key in bands[posting.id] for other in buckets[key]})
+            if matches:
+                scores = similarity(signatures[posting.id], [known[other] for other in matches])
+                duplicates = [other for other, score in zip(matches, scores) if score >= DUPLICATE_THRESHOLD]
+                if duplicates:
+                    posting.canonical_id = min(canonical[other] for other in duplicates)
+                    linked += 1
+            for key in bands[posting.id]:
+                buckets[key].add(posting.id)
+        known[posting.id] = signatures[posting.id]
+        canonical[posting.id] = posting.canonical_id or posting.id
+
+    rows = [{'posting_id': posting.id, 'signature': signatures[posting.id].tobytes()} for posting in postings]
+    band_rows = [{'band_hash': key, 'posting_id': posting_id}
+                 for posting_id, keys in bands.items() for key in set(keys)]
+    for start in range(0, len(rows), chunk_size):
+        insert_or_ignore(PostingMinHash, rows[start:start + chunk_size], ['posting_id'])
+    for start in range(0, len(band_rows), chunk_size):
+        insert_or_ignore(PostingBand, band_rows[start:start + chunk_size], ['band_hash', 'posting_id'])
+    db.session.flush()
+    return linked
+
+
+def index_missing(limit=1000):
+    """Sign, band and link up to `limit` postings that have no signature yet. Returns (indexed, linked)."""
+    from models import JobPosting, PostingMinHash
+    postings = (JobPosting.query
+                .outerjoin(PostingMinHash, PostingMinHash.posting_id == JobPosting.id)
+                .filter(PostingMinHash.posting_id == None)
+                .order_by(JobPosting.id)
+                .limit(limit)
+                .all())
+    return len(postings), link_postings(postings)
+
+
+def score_sources(user_id, jobs):
+    """
+    Match the user's new jobs on duplicate postings to the job whose score
+    they can reuse: the user's oldest other job in the same duplicate group,
+    or else the first of the new jobs in that group.
+
+    Returns:
+        dict: {job.id: Job to copy the score from}
+    """
+    from models import db, Job, JobPosting
+    groups = {job.id: job.posting.canonical_id or job.posting_id for job in jobs}
+    linked = {groups[job.id] for job in jobs if job.posting.canonical_id}
+    if not linked:
+        return {}
+    new_ids = {job.id for job in jobs}
+    representative = {}
+    for job in (Job.query
+                .join(JobPosting, JobPosting.id == Job.posting_id)
+                .filter(Job.user_id == user_id,
+                        db.or_(JobPosting.id.in_(linked), JobPosting.canonical_id.in_(linked)))
+                .order_by(Job.id)):
+        if job.id not in new_ids:
+            representative.setdefault(job.posting.canonical_id or job.posting_id, job)
+
+    sources = {}
+    for job in jobs:
+        group = groups[job.id]
+        if group not in linked:
+            continue
+        if group in representative:
+            sources[job.id] = representative[group]
+        else:
+            representative[group] = job
+    return sources
@@ -0,0 +1,71 @@
+"""
+Per-user progress events
+In-process publish/subscribe used to push background task progress to the
+browser over Server-Sent Events (see /api/events in app.py). Publishers never
+block. Once a slow client has queue_size events waiting, further progress
+events for it are dropped: they are cumulative, so the next one supersedes a
+dropped one. started, search, done and failed are always delivered; a stream
+only lives until its tasks finish, so its queue stays bounded.
+"""
+import json
+import queue
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 100  # events waiting for a subscriber before its progress events are dropped
+
+
+class ProgressBroker:
+    """Fans out events to the open streams of one user."""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}  # user_id -> set of queues
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Open a stream for a user and return the queue its events arrive on."""
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(events)
+        return events
+
+    def unsubscribe(self, user_id, events):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(events)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, event, data):
+        """
+        Send an event to every open stream of user_id.
+
+        Args:
+            user_id: Recipient
+            event: SSE event name, e.g. 'progress'
+            data: JSON-serialisable payload
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for events in subscribers:
+            if event == 'progress' and events.qsize() >= self.queue_size:
+                continue  # the client is behind; the next progress event supersedes this one
+            events.put_nowait((event, data))
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+broker = ProgressBroker()
+
+
+def publish(user_id, event, data):
+    """Publish on the process-wide broker."""
+    broker.publish(user_id, event, data)
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Events message."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
@@ -94,6 +94,27 @@ try:
         else:
             raise
 
+    # Add the local relevance and profile similarity scores to jobs
+    for col in ('prefilter_score', 'similarity'):
+        try:
+            cursor.execute(f"ALTER TABLE jobs ADD COLUMN {col} FLOAT")
+            print(f'   Added {col} column to jobs')
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' in str(e).lower():
+                print(f'   {col} column already exists in jobs')
+            else:
+                raise
+
+    # Link near-duplicate postings (job_postings is created further down on older databases)
+    try:
+        cursor.execute("ALTER TABLE job_postings ADD COLUMN canonical_id INTEGER REFERENCES job_postings(id)")
+        print('   Added canonical_id column to job_postings')
+    except sqlite3.OperationalError as e:
+        if 'duplicate column name' in str(e).lower():
+            print('   canonical_id column already exists in job_postings')
+        elif 'no such table' not in str(e).lower():
+            raise
+
     conn.commit()
     conn.close()
 
@@ -101,10 +122,61 @@ try:
     import sys, os
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
     from app import app, db
+    from models import Job
+    from sqlalchemy import inspect, text
+    from sqlalchemy.schema import CreateTable
     with app.app_context():
+        # Jobs used to hold whole postings; they now live once in job_postings
+        # and jobs keeps only each user's copy (score, star), with the same ids
+        split_jobs = ('jobs' in inspect(db.engine).get_table_names()
+                      and 'posting_id' not in {c['name'] for c in inspect(db.engine).get_columns('jobs')})
+        if split_jobs:
+            with db.engine.begin() as conn:  # the full-text index moves to job_postings too
+                for trigger in ('jobs_fts_insert', 'jobs_fts_delete', 'jobs_fts_update'):
+                    conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+                conn.execute(text('DROP TABLE IF EXISTS jobs_fts'))
+
         db.create_all()
         print('   Ensured all tables exist (including users)')
 
+        if split_jobs:
+            with db.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT OR IGNORE INTO job_postings (source, external_id, url, title, company, location,
+                        salary_min, salary_max, description, requirements, posted_date, first_seen_at)
+                    SELECT source, external_id, url, title, company, location,
+                        salary_min, salary_max, description, requirements, posted_date, scraped_date
+                    FROM jobs ORDER BY id
+                """))
+                for (name,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                                 "AND tbl_name = 'jobs' AND sql IS NOT NULL")).all():
+                    conn.execute(text(f'DROP INDEX {name}'))
+                create_jobs = str(CreateTable(Job.__table__).compile(db.engine))
+                conn.execute(text(create_jobs.replace('CREATE TABLE jobs', 'CREATE TABLE jobs_new', 1)))
+                conn.execute(text("""
+                    INSERT INTO jobs_new (id, user_id, posting_id, source, posted_date, scraped_date,
+                        match_score, match_explanation, prefilter_score, similarity, starred)
+                    SELECT j.id, j.user_id, p.id, j.source, p.posted_date, j.scraped_date,
+                        j.match_score, j.match_explanation, j.prefilter_score, j.similarity, j.starred
+                    FROM jobs j JOIN job_postings p ON p.source = j.source AND p.external_id = j.external_id
+                """))
+                conn.execute(text('DROP TABLE jobs'))
+                conn.execute(text('ALTER TABLE jobs_new RENAME TO jobs'))
+                postings = conn.execute(text('SELECT COUNT(*) FROM job_postings')).scalar()
+                jobs = conn.execute(text('SELECT COUNT(*) FROM jobs')).scalar()
+            print(f'   Moved job postings to the shared catalog ({postings} postings, {jobs} user jobs)')
+
+        # create_all() skips tables that already exist, so add any indexes
+        # declared in models.py that an older database is missing
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        print('   Ensured all indexes exist')
+
+        import search_index
+        if search_index.ensure():
+            print('   Ensured full-text search index exists')
+
     print('Migration complete!')
 
 except Exception as e:
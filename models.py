@@ -1,8 +1,12 @@
 """
 Database models for Job Search Platform
 """
+import base64
+import json
+from collections import namedtuple
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.associationproxy import association_proxy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -30,12 +34,11 @@ class User(db.Model, UserMixin):
         return f'<User {self.username}>'
 
 
-class Job(db.Model):
-    """Job posting model"""
-    __tablename__ = 'jobs'
+class JobPosting(db.Model):
+    """A job posting as scraped, stored once however many users have it (see Job)"""
+    __tablename__ = 'job_postings'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
     source = db.Column(db.String(50), nullable=False)  # linkedin, indeed, ziprecruiter
     external_id = db.Column(db.String(255), nullable=False)  # job ID from source
     url = db.Column(db.Text, nullable=False)
@@ -47,20 +50,115 @@ class Job(db.Model):
     description = db.Column(db.Text)
     requirements = db.Column(db.Text)
     posted_date = db.Column(db.DateTime)
-    scraped_date = db.Column(db.DateTime, default=datetime.utcnow)
+    first_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Earliest posting this one is a near-duplicate of, e.g. from another source (see duplicates.py)
+    canonical_id = db.Column(db.Integer, db.ForeignKey('job_postings.id'), index=True)
+
+    __table_args__ = (db.UniqueConstraint('source', 'external_id', name='unique_job_posting'),)
+
+    def __repr__(self):
+        return f'<JobPosting {self.title} at {self.company}>'
+
+
+class PostingVector(db.Model):
+    """Hashed-feature embedding of a posting's text — see similarity_index.py."""
+    __tablename__ = 'posting_vectors'
+
+    posting_id = db.Column(db.Integer, db.ForeignKey('job_postings.id', ondelete='CASCADE'), primary_key=True)
+    vector = db.Column(db.LargeBinary, nullable=False)  # float32, unit length
+
+    def __repr__(self):
+        return f'<PostingVector {self.posting_id}>'
+
+
+class PostingMinHash(db.Model):
+    """MinHash signature of a posting's text, for near-duplicate detection — see duplicates.py."""
+    __tablename__ = 'posting_minhashes'
+
+    posting_id = db.Column(db.Integer, db.ForeignKey('job_postings.id', ondelete='CASCADE'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # uint32 per permutation
+
+    def __repr__(self):
+        return f'<PostingMinHash {self.posting_id}>'
+
+
+class PostingBand(db.Model):
+    """One LSH band of a posting's MinHash signature; postings sharing a band are duplicate candidates."""
+    __tablename__ = 'posting_bands'
+
+    band_hash = db.Column(db.BigInteger, primary_key=True)  # hash of band number + values
+    posting_id = db.Column(db.Integer, db.ForeignKey('job_postings.id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f'<PostingBand {self.band_hash} posting={self.posting_id}>'
+
+
+@db.event.listens_for(JobPosting.__table__, 'after_create')
+def _create_job_search_index(target, connection, **kw):
+    """Create the full-text index (see search_index.py) along with the postings table."""
+    import search_index
+    search_index.create(connection)
+
+
+class Job(db.Model):
+    """A user's copy of a JobPosting: their match score, star and application"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
+    posting_id = db.Column(db.Integer, db.ForeignKey('job_postings.id'), nullable=False)
+    # Copied from the posting so the job list can filter and sort on its own indexes
+    source = db.Column(db.String(50), nullable=False)
+    posted_date = db.Column(db.DateTime)
+    scraped_date = db.Column(db.DateTime, default=datetime.utcnow)  # when this user got it
     match_score = db.Column(db.Integer)  # AI match score 0-100
     match_explanation = db.Column(db.Text)  # Why it matched
+    prefilter_score = db.Column(db.Float)  # Local keyword relevance 0-100 (ai/prefilter.py)
+    similarity = db.Column(db.Float)  # Cosine similarity to the active profile (similarity_index.py)
     starred = db.Column(db.Boolean, default=False)  # Pinned to top as reminder
 
-    __table_args__ = (db.UniqueConstraint('source', 'external_id', name='unique_job'),)
-
-    # Relationship
+    # Posting content, read through the (eagerly joined) posting
+    external_id = association_proxy('posting', 'external_id')
+    url = association_proxy('posting', 'url')
+    title = association_proxy('posting', 'title')
+    company = association_proxy('posting', 'company')
+    location = association_proxy('posting', 'location')
+    salary_min = association_proxy('posting', 'salary_min')
+    salary_max = association_proxy('posting', 'salary_max')
+    description = association_proxy('posting', 'description')
+    requirements = association_proxy('posting', 'requirements')
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'posting_id', name='unique_user_job'),
+        # Job list: per-user filters, starred pinned first, then the chosen sort
+        db.Index('ix_jobs_user_starred_match', 'user_id', 'starred', 'match_score', 'posted_date'),
+        db.Index('ix_jobs_user_starred_posted', 'user_id', 'starred', 'posted_date'),
+        db.Index('ix_jobs_user_starred_scraped', 'user_id', 'starred', 'scraped_date'),
+        db.Index('ix_jobs_user_starred_similarity', 'user_id', 'starred', 'similarity'),
+        # Source filter and per-source counts
+        db.Index('ix_jobs_user_source', 'user_id', 'source'),
+    )
+
+    # Relationships
+    posting = db.relationship('JobPosting', lazy='joined', innerjoin=True)
     application = db.relationship('Application', backref='job', uselist=False, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Job {self.title} at {self.company}>'
 
 
+class DismissedPosting(db.Model):
+    """A posting the user deleted from their jobs; catalog back-fills (catalog_jobs) skip it."""
+    __tablename__ = 'dismissed_postings'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    posting_id = db.Column(db.Integer, db.ForeignKey('job_postings.id', ondelete='CASCADE'), primary_key=True)
+    dismissed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DismissedPosting user={self.user_id} posting={self.posting_id}>'
+
+
 class Application(db.Model):
     """Application tracking model"""
     __tablename__ = 'applications'
@@ -75,6 +173,12 @@ class Application(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Joined from Job on every board column; status narrows it
+        db.Index('ix_applications_job_status', 'job_id', 'status'),
+        db.Index('ix_applications_status_applied', 'status', 'applied_date'),
+    )
+
     # Relationship
     interviews = db.relationship('Interview', backref='application', cascade='all, delete-orphan')
 
@@ -95,6 +199,10 @@ class Interview(db.Model):
     outcome = db.Column(db.String(50))  # passed, rejected, waiting
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_interviews_application_scheduled', 'application_id', 'scheduled_date'),
+    )
+
     def __repr__(self):
         return f'<Interview {self.interview_type} for Application {self.application_id}>'
 
@@ -104,7 +212,7 @@ class Resume(db.Model):
     __tablename__ = 'resume'
 
     id = db.Column(db.Integer, primary_key=True)
-    profile_id = db.Column(db.Integer, db.ForeignKey('search_preferences.id', ondelete='SET NULL'), nullable=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey('search_preferences.id', ondelete='SET NULL'), nullable=True, index=True)
     filename = db.Column(db.String(255))
     filepath = db.Column(db.String(500))
     content = db.Column(db.Text)  # Parsed text content
@@ -136,6 +244,10 @@ class SearchPreferences(db.Model):
     remote_only = db.Column(db.Boolean, default=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_search_preferences_user_active', 'user_id', 'is_active'),
+    )
+
     resume = db.relationship('Resume', foreign_keys='Resume.profile_id',
                              backref='profile', uselist=False)
 
@@ -148,3 +260,372 @@ class SearchPreferences(db.Model):
 
     def __repr__(self):
         return f'<SearchPreferences {self.name}: {self.job_titles}>'
+
+
+class UserStats(db.Model):
+    """Per-user dashboard counters, maintained incrementally — see user_stats.py."""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    high_match = db.Column(db.Integer, default=0, nullable=False)  # match_score >= 80
+    starred = db.Column(db.Integer, default=0, nullable=False)
+    applied = db.Column(db.Integer, default=0, nullable=False)  # applications by current status
+    interview = db.Column(db.Integer, default=0, nullable=False)
+    offer = db.Column(db.Integer, default=0, nullable=False)
+    rejected = db.Column(db.Integer, default=0, nullable=False)
+    submitted = db.Column(db.Integer, default=0, nullable=False)  # applied, interview, rejected or offer
+    rebuilt_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserStats user={self.user_id} total={self.total}>'
+
+
+class UserSourceStats(db.Model):
+    """Per-user job count for one source."""
+    __tablename__ = 'user_source_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    source = db.Column(db.String(50), primary_key=True)
+    jobs = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<UserSourceStats user={self.user_id} {self.source}={self.jobs}>'
+
+
+class MatchScoreCache(db.Model):
+    """Cached Claude output keyed by a hash of everything that went into the prompt."""
+    __tablename__ = 'match_score_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 hex
+    kind = db.Column(db.String(20), nullable=False)  # score, analysis
+    score = db.Column(db.Integer)
+    text = db.Column(db.Text)  # Score explanation or full analysis
+    hits = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # LRU eviction order
+
+    def __repr__(self):
+        return f'<MatchScoreCache {self.kind} {self.cache_key[:12]}>'
+
+
+class BackgroundTask(db.Model):
+    """Queued unit of background work (e.g. a scrape), claimed by a worker — see tasks.py."""
+    __tablename__ = 'background_tasks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
+    kind = db.Column(db.String(50), nullable=False)  # scrape
+    payload = db.Column(db.Text)  # JSON arguments for the handler
+    dedupe_key = db.Column(db.String(64), unique=True)  # set while queued/running, cleared when finished
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued, running, done, failed
+    progress = db.Column(db.Text)  # JSON progress reported by the handler
+    result = db.Column(db.Text)  # JSON handler return value
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    worker = db.Column(db.String(100))  # host:pid:thread of the claiming worker
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # last progress report; stale running tasks are requeued
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<BackgroundTask {self.id} {self.kind} {self.status}>'
+
+
+class ScrapeQueryState(db.Model):
+    """High-water mark for one (source, keywords, location) search — see scrapers/query_state.py."""
+    __tablename__ = 'scrape_query_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)
+    keywords = db.Column(db.String(255), nullable=False)  # normalised: stripped, lower case
+    location = db.Column(db.String(255), nullable=False)
+    newest_posted_at = db.Column(db.DateTime)  # newest posted_date seen (UTC)
+    known_ids = db.Column(db.Text)  # JSON list of the most recent external ids seen, newest first
+    last_scraped_at = db.Column(db.DateTime)
+    last_found = db.Column(db.Integer)  # jobs the last run returned (after skipping known ones)
+
+    __table_args__ = (db.UniqueConstraint('source', 'keywords', 'location', name='unique_scrape_query'),)
+
+    def __repr__(self):
+        return f'<ScrapeQueryState {self.source} {self.keywords!r} in {self.location!r}>'
+
+
+class ScrapeSchedule(db.Model):
+    """When each user's periodic scrape last ran and is next due — see scheduler.py."""
+    __tablename__ = 'scrape_schedules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), unique=True, nullable=False)
+    last_run_at = db.Column(db.DateTime)  # scheduled or manual all-source scrape
+    next_run_at = db.Column(db.DateTime, index=True)
+    last_task_id = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f'<ScrapeSchedule user={self.user_id} next={self.next_run_at}>'
+
+
+def insert_or_ignore(model, rows, conflict_columns, returning=None):
+    """
+    Bulk INSERT rows (list of dicts), silently skipping any that collide with
+    an existing row on conflict_columns, via ON CONFLICT DO NOTHING (SQLite
+    and Postgres). With returning (a list of columns), the result yields
+    those columns for the rows actually inserted.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f'insert_or_ignore does not support {dialect}')
+    stmt = insert(model).on_conflict_do_nothing(index_elements=conflict_columns)
+    if returning:
+        stmt = stmt.returning(*returning)
+    return db.session.execute(stmt, rows)
+
+
+JOB_FIELDS = ('source', 'external_id', 'url', 'title', 'company', 'location',
+              'salary_min', 'salary_max', 'description', 'requirements', 'posted_date')
+
+
+def bulk_insert_jobs(jobs_data, user_id=None, chunk_size=500, **defaults):
+    """
+    Add scraped job dicts to the shared posting catalog and to a user's job
+    list, skipping any the user already has or that repeat within jobs_data.
+
+    Postings are inserted once with INSERT ... ON CONFLICT DO NOTHING, so the
+    first scrape's copy of a posting is kept. Their ids are resolved with one
+    chunked IN query per source. The user's Job rows then go in with a
+    single INSERT ... ON CONFLICT DO NOTHING as well, so the round-trips
+    don't grow with the number of jobs. Does not commit.
+
+    Args:
+        jobs_data: List of scraped job dicts
+        user_id: Owner of the new rows
+        chunk_size: Maximum number of values per IN clause
+        **defaults: Extra column values for every new row (e.g. match_score)
+
+    Returns:
+        tuple: (new_jobs: list of inserted Job instances, duplicate_count: int
+                of jobs the user already had)
+    """
+    unique = {}
+    dupes = 0
+    for job_data in jobs_data:
+        if not all(job_data.get(field) for field in ('source', 'external_id', 'url', 'title')):
+            print(f'Error saving job: missing required fields in {job_data.get("url")}')
+            continue
+        key = (job_data['source'], str(job_data['external_id']))
+        if key in unique:
+            dupes += 1
+            continue
+        unique[key] = job_data
+    if not unique:
+        return [], dupes
+
+    now = datetime.utcnow()
+    postings = []
+    for key, job_data in unique.items():
+        row = {field: job_data.get(field) for field in JOB_FIELDS}
+        row.update(external_id=key[1], first_seen_at=now)
+        postings.append(row)
+    insert_or_ignore(JobPosting, postings, ['source', 'external_id'])
+    catalog = _find_postings(unique, chunk_size)
+
+    posting_ids = [posting_id for posting_id, _ in catalog.values()]
+    existing = set()
+    for start in range(0, len(posting_ids), chunk_size):
+        existing.update(posting_id for (posting_id,) in
+                        db.session.query(Job.posting_id)
+                        .filter(Job.user_id == user_id, Job.posting_id.in_(posting_ids[start:start + chunk_size])))
+
+    rows = []
+    for key in unique:
+        posting_id, posted_date = catalog[key]
+        if posting_id in existing:
+            dupes += 1
+            continue
+        rows.append(dict(user_id=user_id, posting_id=posting_id, source=key[0], posted_date=posted_date,
+                         scraped_date=now, **defaults))
+    if not rows:
+        return [], dupes
+
+    inserted = insert_or_ignore(Job, rows, ['user_id', 'posting_id'], returning=[Job.id])
+    new_ids = [row_id for (row_id,) in inserted]
+    dupes += len(rows) - len(new_ids)  # lost a race with a concurrent scrape
+
+    new_jobs = []
+    for start in range(0, len(new_ids), chunk_size):
+        new_jobs.extend(Job.query.filter(Job.id.in_(new_ids[start:start + chunk_size])).all())
+    new_jobs.sort(key=lambda job: job.id)
+    return new_jobs, dupes
+
+
+def catalog_jobs(source, external_ids, missing_for=None, limit=None, chunk_size=500):
+    """
+    Job dicts (like a scraper's) for postings already in the catalog, newest
+    first, optionally only those user `missing_for` neither has nor deleted
+    (see dismiss_postings), and at most `limit` of them.
+    """
+    external_ids = [str(external_id) for external_id in external_ids]
+    postings = []
+    for start in range(0, len(external_ids), chunk_size):
+        query = JobPosting.query.filter(JobPosting.source == source,
+                                        JobPosting.external_id.in_(external_ids[start:start + chunk_size]))
+        if missing_for is not None:
+            query = query.filter(
+                JobPosting.id.notin_(db.session.query(Job.posting_id).filter(Job.user_id == missing_for)),
+                JobPosting.id.notin_(db.session.query(DismissedPosting.posting_id)
+                                     .filter(DismissedPosting.user_id == missing_for)))
+        postings.extend(query.order_by(JobPosting.id.desc()).limit(limit).all())
+    postings.sort(key=lambda posting: posting.id, reverse=True)
+    return [{field: getattr(posting, field) for field in JOB_FIELDS} for posting in postings[:limit]]
+
+
+def dismiss_postings(user_id, posting_ids, chunk_size=500):
+    """Remember postings a user deleted, so catalog back-fills don't bring them back. Does not commit."""
+    rows = [{'user_id': user_id, 'posting_id': posting_id, 'dismissed_at': datetime.utcnow()}
+            for posting_id in dict.fromkeys(posting_ids)]
+    for start in range(0, len(rows), chunk_size):
+        insert_or_ignore(DismissedPosting, rows[start:start + chunk_size], ['user_id', 'posting_id'])
+
+
+def _find_postings(keys, chunk_size):
+    """{(source, external_id): (posting id, posted_date)} for catalog postings."""
+    by_source = {}
+    for source, external_id in keys:
+        by_source.setdefault(source, []).append(external_id)
+    found = {}
+    for source, external_ids in by_source.items():
+        for start in range(0, len(external_ids), chunk_size):
+            rows = (db.session.query(JobPosting.external_id, JobPosting.id, JobPosting.posted_date)
+                    .filter(JobPosting.source == source,
+                            JobPosting.external_id.in_(external_ids[start:start + chunk_size])))
+            found.update(((source, external_id), (posting_id, posted_date))
+                         for external_id, posting_id, posted_date in rows)
+    return found
+
+
+# One page of a keyset-paginated query (see keyset_page)
+KeysetPage = namedtuple('KeysetPage', 'items page has_prev has_next prev_cursor next_cursor')
+
+
+def keyset_order(keys):
+    """ORDER BY clauses for keyset keys: every key descending, NULLs last."""
+    return [column.desc().nullslast() if nullable else column.desc() for column, nullable in keys]
+
+
+def keyset_seek(keys, values, backward=False):
+    """
+    WHERE clause selecting the rows after (or, backward, before) the row whose
+    keys are `values` in keyset_order(keys).
+
+    The exact comparison is an OR over the keys; an extra row-value bound on
+    the leading non-nullable keys lets the database seek straight to the
+    cursor in the matching index instead of walking it from the start.
+    """
+    from sqlalchemy import and_, or_, tuple_
+    clauses, equal, bound = [], [], []
+    for (column, nullable), value in zip(keys, values):
+        if value is None:
+            beyond = column.isnot(None) if backward else None
+            same = column.is_(None)
+        else:
+            value = db.literal(value, column.type)
+            beyond = column > value if backward else column < value
+            if nullable and not backward:
+                beyond = or_(beyond, column.is_(None))
+            same = column == value
+            if not nullable and len(bound) == len(equal):
+                bound.append((column, value))
+        if beyond is not None:
+            clauses.append(and_(*equal, beyond))
+        equal.append(same)
+
+    seek = or_(*clauses)
+    if bound:
+        left, right = tuple_(*(c for c, _ in bound)), tuple_(*(v for _, v in bound))
+        seek = and_(left >= right if backward else left <= right, seek)
+    return seek
+
+
+def keyset_page(query, keys, per_page, cursor=None, tag=''):
+    """
+    Fetch one page of a query ordered by keys, seeking from a cursor instead
+    of using OFFSET, so every page costs the same as the first. No COUNT is
+    run; callers that want a total supply their own.
+
+    Args:
+        query: Filtered query (any ORDER BY is replaced)
+        keys: List of (column or expression, nullable) sort keys, ending with
+              a unique one such as the primary key; all sort descending with
+              NULLs last
+        per_page: Rows per page
+        cursor: prev_cursor/next_cursor token of an earlier page, or None for
+                the first page. Malformed tokens, or ones minted with another
+                tag, also give the first page.
+        tag: Label baked into cursors (e.g. the sort name)
+
+    Returns:
+        KeysetPage
+    """
+    position = _decode_cursor(cursor, keys, tag)
+    page, backward, values = position or (1, False, None)
+    seeking = query.order_by(None)
+    if values is not None:
+        seeking = seeking.filter(keyset_seek(keys, values, backward))
+    if backward:
+        order = [column.asc().nullsfirst() if nullable else column.asc() for column, nullable in keys]
+    else:
+        order = keyset_order(keys)
+    # Select the key values alongside each row, since keys may be expressions
+    # (e.g. a search rank) rather than attributes of the row
+    key_columns = [column.label(f'keyset_{i}') for i, (column, _) in enumerate(keys)]
+    rows = [(row[0], tuple(row[1:]))
+            for row in seeking.add_columns(*key_columns).order_by(*order).limit(per_page + 1)]
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        if not more:  # reached the start: show a full first page
+            return keyset_page(query, keys, per_page, tag=tag)
+        rows.reverse()
+        has_prev, has_next = True, True
+    else:
+        has_prev, has_next = values is not None, more
+
+    def cursor_for(row, to_page, towards_start):
+        return _encode_cursor(tag, to_page, towards_start, row[1])
+
+    return KeysetPage(
+        items=[item for item, _ in rows],
+        page=page,
+        has_prev=has_prev,
+        has_next=has_next,
+        prev_cursor=cursor_for(rows[0], page - 1, True) if has_prev and rows else None,
+        next_cursor=cursor_for(rows[-1], page + 1, False) if has_next and rows else None,
+    )
+
+
+def _encode_cursor(tag, page, backward, values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps([tag, page, backward, values], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, keys, tag):
+    """(page, backward, values) from a cursor token, or None if it doesn't fit keys/tag."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_tag, page, backward, values = json.loads(raw)
+        if cursor_tag != tag or len(values) != len(keys) or not isinstance(page, int):
+            return None
+        values = [datetime.fromisoformat(value) if value is not None and isinstance(column.type, db.DateTime)
+                  else value for (column, _), value in zip(keys, values)]
+    except (ValueError, TypeError):
+        return None
+    return max(page, 1), bool(backward), values
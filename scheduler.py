@@ -0,0 +1,169 @@
+"""
+Periodic scrape scheduler
+Queues an all-source scrape for every user once per SCRAPE_FREQUENCY_HOURS.
+
+Each user gets a fixed phase within the frequency window, derived from a hash
+of their id, so runs are spread evenly across the window instead of all
+firing on the hour; a random jitter of up to SCRAPE_JITTER_MINUTES on top
+keeps users that hash close together from hitting the job boards in the same
+minute. Next-run times are always snapped back to the user's phase, so after
+downtime overdue users catch up spread out rather than in one burst, and a
+recent manual scrape pushes the next scheduled one to the following slot.
+
+Schedules are persisted in the scrape_schedules table and each due row is
+claimed with a conditional UPDATE, so several scheduler threads or processes
+can run at once without queuing a user twice. Scrapes themselves go through
+the background task queue (tasks.py).
+"""
+import hashlib
+import math
+import random
+import threading
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(2000, 1, 1)
+
+_embedded = []
+_embedded_lock = threading.Lock()
+
+
+def phase_offset(user_id, period_seconds):
+    """Stable offset (seconds) of a user's runs within the period."""
+    digest = hashlib.sha256(str(user_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % max(1, int(period_seconds))
+
+
+def next_run_at(user_id, earliest, period_seconds, jitter_seconds=0):
+    """
+    First slot of the user's phase at or after `earliest`, plus jitter.
+
+    Args:
+        user_id: User whose phase to use
+        earliest: Lower bound for the slot (naive UTC datetime)
+        period_seconds: Scrape frequency
+        jitter_seconds: Maximum random offset either way
+
+    Returns:
+        datetime
+    """
+    phase = phase_offset(user_id, period_seconds)
+    elapsed = (earliest - _EPOCH).total_seconds()
+    slot = phase + math.ceil((elapsed - phase) / period_seconds) * period_seconds
+    if jitter_seconds:
+        slot += random.uniform(-jitter_seconds, jitter_seconds)
+    return _EPOCH + timedelta(seconds=slot)
+
+
+def record_run(user_id, period_seconds, jitter_seconds=0, task_id=None, now=None):
+    """
+    Note that a full scrape just ran (or was queued) for a user and move their
+    next scheduled run to the first slot at least half a period away. Does not
+    commit.
+    """
+    from models import db, ScrapeSchedule
+    now = now or datetime.utcnow()
+    schedule = ScrapeSchedule.query.filter_by(user_id=user_id).first()
+    if schedule is None:
+        schedule = ScrapeSchedule(user_id=user_id)
+        db.session.add(schedule)
+    schedule.last_run_at = now
+    schedule.next_run_at = next_run_at(user_id, now + timedelta(seconds=period_seconds / 2),
+                                       period_seconds, jitter_seconds)
+    if task_id is not None:
+        schedule.last_task_id = task_id
+    return schedule
+
+
+def ensure_schedules(period_seconds, jitter_seconds=0):
+    """Create schedule rows for users that have none, due at their next slot. Commits."""
+    from models import db, User, ScrapeSchedule, insert_or_ignore
+    now = datetime.utcnow()
+    missing = (db.session.query(User.id)
+               .outerjoin(ScrapeSchedule, ScrapeSchedule.user_id == User.id)
+               .filter(ScrapeSchedule.id == None, User.is_active == True)
+               .all())
+    if missing:
+        insert_or_ignore(ScrapeSchedule, [
+            {'user_id': user_id, 'next_run_at': next_run_at(user_id, now, period_seconds, jitter_seconds)}
+            for (user_id,) in missing
+        ], ['user_id'])
+    db.session.commit()
+    return len(missing)
+
+
+def run_due(enqueue_scrape, period_seconds, jitter_seconds=0, now=None):
+    """
+    Queue scrapes for every user whose next run is due.
+
+    Args:
+        enqueue_scrape: Callable(user_id) -> task id, or None when the user
+            has nothing to scrape (e.g. no job titles); their slot still advances
+        period_seconds: Scrape frequency
+        jitter_seconds: Maximum random offset of the next run
+
+    Returns:
+        list: (user_id, task_id) for the users claimed in this pass
+    """
+    from models import db, ScrapeSchedule
+    now = now or datetime.utcnow()
+    due = (db.session.query(ScrapeSchedule.id, ScrapeSchedule.user_id, ScrapeSchedule.next_run_at)
+           .filter(ScrapeSchedule.next_run_at <= now)
+           .order_by(ScrapeSchedule.next_run_at)
+           .all())
+    queued = []
+    for schedule_id, user_id, due_at in due:
+        following = next_run_at(user_id, now + timedelta(seconds=period_seconds / 2),
+                                period_seconds, jitter_seconds)
+        claimed = (ScrapeSchedule.query
+                   .filter(ScrapeSchedule.id == schedule_id, ScrapeSchedule.next_run_at == due_at)
+                   .update({ScrapeSchedule.next_run_at: following}, synchronize_session=False))
+        db.session.commit()
+        if not claimed:
+            continue  # another scheduler took it
+        try:
+            task_id = enqueue_scrape(user_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f'Scheduled scrape for user {user_id} failed to queue: {e}')
+            continue
+        if task_id is not None:
+            (ScrapeSchedule.query
+             .filter(ScrapeSchedule.id == schedule_id)
+             .update({ScrapeSchedule.last_run_at: now, ScrapeSchedule.last_task_id: task_id},
+                     synchronize_session=False))
+            db.session.commit()
+        queued.append((user_id, task_id))
+    return queued
+
+
+def run_scheduler(app, enqueue_scrape, stop=None, interval=None):
+    """
+    Check for due users every `interval` seconds until stop is set.
+    Does nothing while SCRAPE_FREQUENCY_HOURS is 0.
+    """
+    stop = stop or threading.Event()
+    interval = interval or app.config['SCHEDULER_INTERVAL_SECONDS']
+    while not stop.is_set():
+        period = app.config['SCRAPE_FREQUENCY_HOURS'] * 3600
+        jitter = app.config['SCRAPE_JITTER_MINUTES'] * 60
+        if period > 0:
+            with app.app_context():
+                try:
+                    ensure_schedules(period, jitter)
+                    for user_id, task_id in run_due(enqueue_scrape, period, jitter):
+                        if task_id is not None:
+                            print(f'⏰ Scheduled scrape queued for user {user_id} (task {task_id})')
+                except Exception as e:
+                    print(f'Scheduler error: {e}')
+        stop.wait(interval)
+
+
+def start_embedded_scheduler(app, enqueue_scrape):
+    """Start the scheduler thread inside this process, once. Returns the stop event."""
+    with _embedded_lock:
+        if not _embedded:
+            stop = threading.Event()
+            threading.Thread(target=run_scheduler, args=(app, enqueue_scrape, stop),
+                             name='scrape-scheduler', daemon=True).start()
+            _embedded.append(stop)
+        return _embedded[0]
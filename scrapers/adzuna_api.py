@@ -4,15 +4,61 @@ Free API that aggregates jobs from Indeed, Monster, CareerBuilder, etc.
 
 Get API keys: https://developer.adzuna.com/
 """
-import requests
+import math
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from .base import BaseScraper
+from .registry import register
+
+RESULTS_PER_PAGE = 50  # Adzuna's maximum page size
+PAGE_CONCURRENCY = int(os.getenv('ADZUNA_PAGE_CONCURRENCY', 4))
+
+_session = None
+_session_lock = threading.Lock()
 
 
+def get_session():
+    """
+    Return the process-wide Adzuna HTTP session.
+
+    Connections are pooled and kept alive across pages and scraper instances,
+    and 429/5xx responses are retried with exponential backoff (honouring
+    Retry-After) before an error is raised.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=4,
+                backoff_factor=0.5,  # 0.5s, 1s, 2s, 4s
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=16)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+@register
 class AdzunaAPIScraper(BaseScraper):
     """Scraper for Adzuna API"""
     
+    name = 'adzuna'
+    label = 'Adzuna'
+    max_concurrency = int(os.getenv('ADZUNA_CONCURRENCY', 4))
+    rate_limit = float(os.getenv('ADZUNA_RATE_LIMIT', 2))  # searches started per second
+    supports_incremental = True
+    
     def __init__(self):
         super().__init__()
         self.source = 'adzuna'
@@ -37,73 +83,135 @@ class AdzunaAPIScraper(BaseScraper):
         Returns:
             list: List of job dictionaries
         """
+        jobs = []
+        try:
+            jobs.extend(self.iter_jobs(keywords, location, max_results))
+        except requests.exceptions.RequestException:
+            pass  # logged by iter_jobs; keep whatever was fetched before the error
+        return jobs
+    
+    def iter_jobs(self, keywords='', location='', max_results=50, verbose=False, since=None):
+        """
+        Yield jobs page by page as the API returns them (verbose is ignored).
+        
+        With since (a QueryMark from an earlier run of this search), results
+        are requested newest first and limited to the days since the newest
+        posting seen; paging stops at the first already-known job.
+        
+        A failed first page, or a failed later page of an incremental run, is
+        logged and re-raised, so the planner records the search as failed and
+        its high-water mark doesn't skip past the missing postings.
+        """
         if not self.app_id or not self.app_key:
             print('❌ Adzuna API credentials not set. Add ADZUNA_APP_ID and ADZUNA_APP_KEY to .env')
             print('   Get free API keys: https://developer.adzuna.com/')
-            return []
-        
-        jobs = []
-        page = 1
-        results_per_page = 50
+            return
         
         # Clean location - Adzuna prefers just city name or zip code
         # "Portland, OR" -> "Portland"
         clean_location = location.split(',')[0].strip() if location else ''
         
-        print(f'🔍 Searching Adzuna API: {keywords} in {clean_location}')
+        incremental = since is not None and bool(since.known_ids)
+        print(f'🔍 Searching Adzuna API: {keywords} in {clean_location}'
+              + (' (new since last run)' if incremental else ''))
         
-        while len(jobs) < max_results:
-            try:
-                # Adzuna API format: /v1/api/jobs/us/search/{page}
-                url = f'{self.base_url}/{page}'
-                
-                # Build API request - page is in URL, not params
-                params = {
-                    'app_id': self.app_id,
-                    'app_key': self.app_key,
-                    'results_per_page': min(results_per_page, max_results - len(jobs))
-                }
-                
-                # Only add what/where if they have values
-                if keywords:
-                    params['what'] = keywords
-                if clean_location:
-                    params['where'] = clean_location
-                
-                response = requests.get(url, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                if 'results' not in data or len(data['results']) == 0:
-                    break
-                
-                # Parse results
-                for job_data in data['results']:
-                    try:
-                        job = self._parse_job(job_data)
-                        if job:
-                            jobs.append(job)
-                    except Exception as e:
-                        print(f'   ⚠️  Error parsing job: {e}')
-                        continue
-                
-                print(f'   Found {len(jobs)} jobs so far...')
-                
-                # Check if there are more pages
-                if len(data['results']) < results_per_page:
+        results_per_page = min(RESULTS_PER_PAGE, max_results)
+        params = {
+            'app_id': self.app_id,
+            'app_key': self.app_key,
+            'results_per_page': results_per_page,
+        }
+        # Only add what/where if they have values
+        if keywords:
+            params['what'] = keywords
+        if clean_location:
+            params['where'] = clean_location
+        if incremental:
+            params['sort_by'] = 'date'
+            newest = since.newest_posted_at or since.last_scraped_at
+            if newest:
+                days = (datetime.utcnow() - newest).days
+                params['max_days_old'] = max(1, days + 1)
+        
+        try:
+            first_page = self._fetch_page(1, params)
+        except requests.exceptions.RequestException as e:
+            print(f'   ❌ API request error: {e}')
+            raise
+        
+        if incremental:
+            yield from self._iter_new_jobs(first_page, params, results_per_page, max_results, since.known_ids)
+            return
+        
+        found = 0
+        for job in self._parse_results(first_page)[:max_results]:
+            found += 1
+            yield job
+        
+        # Page 1 tells us how many results exist; fetch the rest in parallel
+        total = first_page.get('count') or 0
+        last_page = min(math.ceil(total / results_per_page), math.ceil(max_results / results_per_page))
+        if len(first_page.get('results', [])) == results_per_page and last_page > 1:
+            pages = range(2, last_page + 1)
+            with ThreadPoolExecutor(max_workers=min(PAGE_CONCURRENCY, len(pages))) as pool:
+                for data in pool.map(lambda page: self._fetch_page_safe(page, params), pages):
+                    for job in self._parse_results(data or {}):
+                        if found >= max_results:
+                            break
+                        found += 1
+                        yield job
+        
+        print(f'✅ Found {found} jobs from Adzuna')
+    
+    def _iter_new_jobs(self, first_page, params, results_per_page, max_results, known_ids):
+        """Page through newest-first results one page at a time until a known job turns up."""
+        found = 0
+        page, data = 1, first_page
+        while data:
+            for job in self._parse_results(data):
+                if job['external_id'] in known_ids:
+                    print(f'✅ Found {found} new jobs from Adzuna (stopped at a known job on page {page})')
+                    return
+                if found >= max_results:
                     break
-                
-                page += 1
-                
-            except requests.exceptions.RequestException as e:
-                print(f'   ❌ API request error: {e}')
+                found += 1
+                yield job
+            if found >= max_results or len(data.get('results', [])) < results_per_page:
                 break
+            page += 1
+            try:
+                data = self._fetch_page(page, params)
+            except requests.exceptions.RequestException as e:
+                print(f'   ❌ API request error on page {page}: {e}')
+                raise
+        print(f'✅ Found {found} new jobs from Adzuna')
+    
+    def _fetch_page(self, page, params):
+        """GET one results page; raises after retries are exhausted."""
+        # Adzuna API format: /v1/api/jobs/us/search/{page} - page is in URL, not params
+        response = get_session().get(f'{self.base_url}/{page}', params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    
+    def _fetch_page_safe(self, page, params):
+        """Like _fetch_page, but logs and returns None on failure."""
+        try:
+            return self._fetch_page(page, params)
+        except Exception as e:
+            print(f'   ❌ API request error on page {page}: {e}')
+            return None
+    
+    def _parse_results(self, data):
+        """Parse every job in one page of API results."""
+        jobs = []
+        for job_data in data.get('results', []):
+            try:
+                job = self._parse_job(job_data)
+                if job:
+                    jobs.append(job)
             except Exception as e:
-                print(f'   ❌ Error: {e}')
-                break
-        
-        print(f'✅ Found {len(jobs)} jobs from Adzuna')
-        return jobs[:max_results]
+                print(f'   ⚠️  Error parsing job: {e}')
+        return jobs
     
     def _parse_job(self, data):
         """Parse job data from Adzuna API response"""
@@ -8,7 +8,18 @@ from bs4 import BeautifulSoup
 
 
 class BaseScraper(ABC):
-    """Abstract base class for job scrapers"""
+    """Abstract base class for job scrapers
+
+    Subclasses register with scrapers.registry and declare their
+    capabilities as class attributes so the scrape planner can schedule them.
+    """
+    
+    name = None               # Source id stored in Job.source, e.g. 'adzuna'
+    label = None              # Display name, e.g. 'Adzuna'
+    supports_verbose = False  # scrape() accepts verbose=True for full descriptions
+    max_concurrency = 1       # Searches of this source allowed to run at once
+    rate_limit = None         # Max searches started per second (None = unlimited)
+    supports_incremental = False  # iter_jobs() accepts since= and skips already-seen postings
     
     def __init__(self):
         self.headers = {
@@ -31,18 +42,33 @@ class BaseScraper(ABC):
         """
         pass
     
-    @abstractmethod
+    def iter_jobs(self, keywords='', location='', max_results=50, verbose=False):
+        """
+        Yield job dictionaries for one search.
+        
+        This is the interface the planner uses. The default runs scrape()
+        and yields its results; verbose is only passed to sources that
+        declare supports_verbose. Sources that declare supports_incremental
+        override this with an extra since=QueryMark argument (see
+        scrapers/query_state.py).
+        """
+        kwargs = {'keywords': keywords, 'location': location, 'max_results': max_results}
+        if self.supports_verbose:
+            kwargs['verbose'] = verbose
+        yield from self.scrape(**kwargs) or []
+    
     def parse_job_card(self, card):
         """
-        Parse a single job card/listing
+        Parse a single job card/listing. Optional: sources that don't parse
+        cards this way (e.g. asynchronous Playwright scrapers) leave it out.
         
         Args:
             card: BeautifulSoup element of job card
             
         Returns:
-            Dictionary with job data
+            Dictionary with job data, or None
         """
-        pass
+        return None
     
     def clean_salary(self, salary_text):
         """Extract salary range from text"""
@@ -100,39 +126,8 @@ class BaseScraper(ABC):
     
     def save_jobs(self):
         """Save scraped jobs to database"""
-        from models import db, Job
-        from datetime import datetime
-        
-        saved_count = 0
-        
-        for job_data in self.jobs:
-            # Check if job already exists
-            existing = Job.query.filter_by(
-                source=job_data['source'],
-                external_id=job_data['external_id']
-            ).first()
-            
-            if existing:
-                continue
-            
-            # Create new job
-            job = Job(
-                source=job_data['source'],
-                external_id=job_data['external_id'],
-                url=job_data['url'],
-                title=job_data['title'],
-                company=job_data.get('company'),
-                location=job_data.get('location'),
-                salary_min=job_data.get('salary_min'),
-                salary_max=job_data.get('salary_max'),
-                description=job_data.get('description'),
-                requirements=job_data.get('requirements'),
-                posted_date=job_data.get('posted_date'),
-                scraped_date=datetime.utcnow()
-            )
-            
-            db.session.add(job)
-            saved_count += 1
+        from models import db, bulk_insert_jobs
         
+        new_jobs, _ = bulk_insert_jobs(self.jobs)
         db.session.commit()
-        return saved_count
+        return len(new_jobs)
@@ -0,0 +1,192 @@
+"""
+Shared Playwright browser pool
+One long-lived headless Chromium per process, handing out isolated browser
+contexts to scrape tasks instead of launching a browser for every
+title/location pair.
+
+Playwright objects are bound to the event loop that created them, so the pool
+owns a private asyncio loop on a daemon thread. Callers on any thread submit
+work with BrowserPool.run(), which blocks until it finishes, or
+BrowserPool.stream(), which yields results as they are produced.
+"""
+import asyncio
+import atexit
+import os
+import queue
+import threading
+
+from playwright.async_api import async_playwright
+
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+]
+
+CONTEXT_OPTIONS = {
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'viewport': {'width': 1920, 'height': 1080},
+    'locale': 'en-US',
+}
+
+
+class BrowserPool:
+    """Long-lived browser that hands out isolated contexts, at most max_contexts at a time."""
+
+    def __init__(self, max_contexts=2, recycle_after_pages=100, headless=True):
+        """
+        Args:
+            max_contexts: Maximum number of contexts open at once; further
+                run() calls wait for a free slot
+            recycle_after_pages: Restart the browser once this many pages have
+                been opened in it, to bound memory growth
+            headless: Launch Chromium without a display
+        """
+        self.max_contexts = max_contexts
+        self.recycle_after_pages = recycle_after_pages
+        self.headless = headless
+        self.pages_served = 0  # pages opened since the current browser launched
+        self.launches = 0
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._playwright = None
+        self._browser = None
+        self._active = 0
+
+    def run(self, fn, timeout=None):
+        """
+        Run `await fn(context)` with a fresh browser context and return its result.
+
+        The context is closed afterwards whatever happens. Blocks the calling
+        thread; safe to call from several threads at once.
+
+        Args:
+            fn: Coroutine function taking a playwright BrowserContext
+            timeout: Optional overall timeout in seconds
+        """
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._run(fn), self._loop)
+        return future.result(timeout)
+
+    def stream(self, fn):
+        """
+        Run `await fn(context, emit)` like run(), yielding every item passed
+        to emit() as soon as it is produced. Errors raised by fn propagate
+        once the items emitted before them have been yielded.
+        """
+        self._ensure_started()
+        items = queue.Queue()
+        done = object()
+        future = asyncio.run_coroutine_threadsafe(self._run(lambda context: fn(context, items.put)), self._loop)
+        future.add_done_callback(lambda _: items.put(done))
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                yield item
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def shutdown(self):
+        """Close the browser and stop the pool's event loop."""
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is None:
+                return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_browser(stop=True), self._loop).result(30)
+        except Exception as e:
+            print(f'   ⚠️  Browser pool shutdown error: {e}')
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._closed:
+                raise RuntimeError('Browser pool has been shut down')
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._init_primitives(), self._loop).result()
+
+    async def _init_primitives(self):
+        # Created on the pool's own loop
+        self._slots = asyncio.Semaphore(self.max_contexts)
+        self._state = asyncio.Condition()
+
+    async def _run(self, fn):
+        async with self._slots:
+            browser = await self._acquire_browser()
+            try:
+                context = await browser.new_context(**CONTEXT_OPTIONS)
+                context.on('page', self._count_page)
+                try:
+                    return await fn(context)
+                finally:
+                    await context.close()
+            finally:
+                await self._release_browser()
+
+    async def _acquire_browser(self):
+        async with self._state:
+            if self._browser is not None and not self._browser.is_connected():
+                await self._close_browser()  # crashed; relaunch below
+            elif self._browser is not None and self.pages_served >= self.recycle_after_pages:
+                # Let in-flight contexts finish, then restart with a fresh process
+                await self._state.wait_for(lambda: self._active == 0)
+                if self._browser is not None and self.pages_served >= self.recycle_after_pages:
+                    print(f'   ♻️  Recycling browser after {self.pages_served} pages')
+                    await self._close_browser()
+            if self._browser is None:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+                self.pages_served = 0
+                self.launches += 1
+            self._active += 1
+            return self._browser
+
+    async def _release_browser(self):
+        async with self._state:
+            self._active -= 1
+            self._state.notify_all()
+
+    def _count_page(self, page):
+        self.pages_served += 1
+
+    async def _close_browser(self, stop=False):
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        if stop and self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Return the process-wide browser pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                max_contexts=int(os.getenv('BROWSER_POOL_MAX_CONTEXTS', 2)),
+                recycle_after_pages=int(os.getenv('BROWSER_POOL_RECYCLE_PAGES', 100)),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -2,120 +2,274 @@
 Indeed scraper using Playwright (headless browser)
 More reliable than requests - harder for Indeed to block
 """
-from playwright.sync_api import sync_playwright
+import asyncio
 import hashlib
+import os
+import time
 from datetime import datetime
+from urllib.parse import urlparse
 import re
 
+from .base import BaseScraper
+from .browser_pool import get_browser_pool
+from .registry import register
 
-class IndeedPlaywrightScraper:
+JOB_CARD_SELECTOR = '.job_seen_beacon, .cardOutline, .slider_item'
+DESCRIPTION_SELECTOR = '#jobDescriptionText, .jobsearch-jobDescriptionText, [data-testid="jobsearch-JobComponent-description"]'
+
+# Per-page budgets for the page to become usable, in milliseconds
+SEARCH_READY_TIMEOUT_MS = int(os.getenv('INDEED_SEARCH_READY_TIMEOUT_MS', 15000))
+DETAIL_READY_TIMEOUT_MS = int(os.getenv('INDEED_DETAIL_READY_TIMEOUT_MS', 8000))
+
+# Verbose mode: job pages fetched in parallel per search, with heavy/tracking requests blocked
+DESCRIPTION_CONCURRENCY = int(os.getenv('INDEED_DESCRIPTION_CONCURRENCY', 4))
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'stylesheet', 'media'}
+BLOCKED_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+    'googlesyndication.com', 'facebook.net', 'hotjar.com', 'bat.bing.com',
+    'scorecardresearch.com', 'quantserve.com', 'demdex.net',
+)
+
+
+async def _block_heavy_resources(route):
+    """Abort requests a description fetch doesn't need."""
+    request = route.request
+    host = urlparse(request.url).hostname or ''
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+@register
+class IndeedPlaywrightScraper(BaseScraper):
     """Scraper for Indeed using Playwright"""
     
+    name = 'indeed'
+    label = 'Indeed'
+    supports_verbose = True
+    max_concurrency = int(os.getenv('INDEED_CONCURRENCY', 2))  # bounded by browser pool contexts anyway
+    supports_incremental = True
+    
     def __init__(self):
+        super().__init__()
         self.base_url = "https://www.indeed.com"
-        self.jobs = []
+        self.readiness_timings = []  # {'page', 'seconds', 'ready'} per navigation
     
     def scrape(self, keywords='python developer', location='Portland, OR', max_results=50, verbose=False):
         """Scrape jobs from Indeed using real browser.
         verbose=True: navigate to each job page for full description (slower).
         verbose=False: use search result snippet only (faster).
+        Runs in an isolated context on the shared browser pool.
+        """
+        try:
+            for job_data in self.iter_jobs(keywords, location, max_results, verbose):
+                self.jobs.append(job_data)
+        except Exception:
+            pass  # logged by iter_jobs; keep whatever was scraped before the error
+        return self.jobs
+    
+    def iter_jobs(self, keywords='python developer', location='Portland, OR', max_results=50, verbose=False,
+                  since=None):
+        """
+        Yield jobs as they are parsed (in verbose mode, as their descriptions arrive, in card order).
+        
+        With since (a QueryMark from an earlier run of this search), results
+        are sorted by date and cards already returned before are skipped, so
+        no full description is fetched for them.
+        
+        Errors are logged and re-raised, so the planner records the search as
+        failed and its high-water mark doesn't advance.
         """
         print(f'🔍 Scraping Indeed for: {keywords} in {location} (verbose={verbose})')
         
-        with sync_playwright() as p:
-            # Launch browser in headless mode (required on servers with no display)
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                ]
-            )
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                locale='en-US',
-            )
-            page = context.new_page()
-            page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        found = 0
+        try:
+            for job_data in get_browser_pool().stream(
+                lambda context, emit: self._scrape_in_context(context, emit, keywords, location, max_results,
+                                                              verbose, since)
+            ):
+                found += 1
+                yield job_data
+        except Exception as e:
+            print(f'   ❌ Error during scraping: {e}')
+            raise
+        finally:
+            summary = self.readiness_summary()
+            if summary:
+                print(f'   Readiness: {summary}')
+        
+        print(f'✅ Successfully scraped {found} jobs from Indeed')
+    
+    def readiness_summary(self):
+        """One-line summary of how long pages took to become ready."""
+        parts = []
+        for kind in ('search', 'detail'):
+            timings = [t for t in self.readiness_timings if t['page'] == kind]
+            if not timings:
+                continue
+            seconds = [t['seconds'] for t in timings]
+            timeouts = sum(1 for t in timings if not t['ready'])
+            part = f'{kind} avg {sum(seconds) / len(seconds):.2f}s, max {max(seconds):.2f}s over {len(timings)}'
+            if timeouts:
+                part += f' ({timeouts} timed out)'
+            parts.append(part)
+        return '; '.join(parts)
+    
+    async def _goto_ready(self, page, url, ready_selector, timeout_ms, kind):
+        """
+        Navigate and wait until ready_selector is attached, instead of
+        sleeping a fixed time. If the selector never shows up within the
+        budget, fall back to network idle for whatever budget is left.
+        Records the time taken in self.readiness_timings.
+        Returns True if the selector appeared.
+        """
+        started = time.monotonic()
+        await page.goto(url, timeout=timeout_ms * 2, wait_until='domcontentloaded')
+        ready = True
+        try:
+            await page.wait_for_selector(ready_selector, state='attached', timeout=timeout_ms)
+        except Exception:
+            ready = False
+            remaining_ms = timeout_ms - (time.monotonic() - started) * 1000
+            if remaining_ms > 0:
+                try:
+                    await page.wait_for_load_state('networkidle', timeout=remaining_ms)
+                except Exception:
+                    pass
+        self.readiness_timings.append({'page': kind, 'seconds': time.monotonic() - started, 'ready': ready})
+        return ready
+    
+    async def _scrape_in_context(self, context, emit, keywords, location, max_results, verbose, since=None):
+        """Run one search inside a browser context from the pool, passing each job to emit()."""
+        await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        page = await context.new_page()
+        
+        # Build search URL
+        search_url = f"{self.base_url}/jobs?q={keywords}&l={location}"
+        known_ids = since.known_ids if since is not None else frozenset()
+        if known_ids:
+            search_url += '&sort=date'
+            newest = since.newest_posted_at or since.last_scraped_at
+            if newest:
+                # Indeed's "date posted" filter only takes these values
+                days = (datetime.utcnow() - newest).days + 1
+                search_url += f'&fromage={next((d for d in (1, 3, 7, 14) if d >= days), 14)}'
+        
+        try:
+            # Navigate to Indeed and wait for job cards to render
+            print(f'   Navigating to: {search_url}')
+            if not await self._goto_ready(page, search_url, JOB_CARD_SELECTOR, SEARCH_READY_TIMEOUT_MS, 'search'):
+                print(f'   No job cards after {SEARCH_READY_TIMEOUT_MS / 1000:.0f}s')
+            
+            # Get all job cards (try multiple selectors, don't wait)
+            job_cards = await page.query_selector_all('.job_seen_beacon')
+            
+            if not job_cards:
+                print('   No .job_seen_beacon found, trying .cardOutline...')
+                job_cards = await page.query_selector_all('.cardOutline')
+            
+            if not job_cards:
+                print('   No .cardOutline found, trying .slider_item...')
+                job_cards = await page.query_selector_all('.slider_item')
+            
+            if not job_cards:
+                print(f'   Page title: {await page.title()}')
+                print(f'   Page URL: {page.url}')
+            print(f'   Found {len(job_cards)} job cards')
             
-            # Build search URL
-            search_url = f"{self.base_url}/jobs?q={keywords}&l={location}"
+            parsed = []
+            skipped = 0
+            for i, card in enumerate(job_cards[:max_results]):
+                try:
+                    job_data = await self.parse_job_card_playwright(card, page)
+                    if job_data and job_data['external_id'] in known_ids:
+                        skipped += 1
+                    elif job_data:
+                        if not verbose:
+                            print(f'   ✅ Parsed: {job_data["title"][:50]}...')
+                            emit(job_data)
+                        parsed.append(job_data)
+                except Exception as e:
+                    print(f'   ⚠️  Error parsing job {i}: {e}')
+                    continue
             
+            if skipped:
+                print(f'   Skipped {skipped} jobs seen in earlier runs')
+            if verbose:
+                await self._fetch_descriptions(context, parsed, emit)
+        finally:
+            await page.close()
+    
+    async def _fetch_descriptions(self, context, jobs, emit):
+        """
+        Fill in full descriptions using a small pool of extra tabs, so job
+        pages load in parallel and the search results page is left intact.
+        Heavy and tracking resources are blocked on those tabs. Results are
+        written into each job dict, and jobs are passed to emit() in card
+        order as soon as they and every job before them are done.
+        """
+        done = [False] * len(jobs)
+        next_to_emit = 0
+        
+        def mark_done(i):
+            nonlocal next_to_emit
+            done[i] = True
+            while next_to_emit < len(jobs) and done[next_to_emit]:
+                emit(jobs[next_to_emit])
+                next_to_emit += 1
+        
+        queue = asyncio.Queue()
+        for i, job_data in enumerate(jobs):
+            if job_data.get('url'):
+                queue.put_nowait((i, job_data))
+            else:
+                mark_done(i)
+        
+        async def worker():
+            page = await context.new_page()
+            await page.route('**/*', _block_heavy_resources)
             try:
-                # Navigate to Indeed
-                print(f'   Navigating to: {search_url}')
-                page.goto(search_url, timeout=30000)
-                
-                # Wait for page to fully load
-                import time
-                print(f'   Waiting for page to load...')
-                time.sleep(5)  # Give Indeed time to render
-                
-                # Get all job cards (try multiple selectors, don't wait)
-                job_cards = page.query_selector_all('.job_seen_beacon')
-                
-                if not job_cards:
-                    print(f'   No .job_seen_beacon found, trying .cardOutline...')
-                    job_cards = page.query_selector_all('.cardOutline')
-                
-                if not job_cards:
-                    print(f'   No .cardOutline found, trying .slider_item...')
-                    job_cards = page.query_selector_all('.slider_item')
-                
-                if not job_cards:
-                    print(f'   Page title: {page.title()}')
-                    print(f'   Page URL: {page.url}')
-                print(f'   Found {len(job_cards)} job cards')
-                
-                for i, card in enumerate(job_cards[:max_results]):
+                while True:
                     try:
-                        job_data = self.parse_job_card_playwright(card, page)
-                        if job_data:
-                            if verbose and job_data.get('url'):
-                                try:
-                                    job_data['description'] = self.fetch_full_description(page, job_data['url'])
-                                    print(f'   ✅ Full desc: {job_data["title"][:50]}...')
-                                except Exception as e:
-                                    print(f'   ⚠️  Full desc failed for job {i}: {e}')
-                            else:
-                                print(f'   ✅ Parsed: {job_data["title"][:50]}...')
-                            self.jobs.append(job_data)
+                        i, job_data = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        job_data['description'] = await self.fetch_full_description(page, job_data['url'])
+                        print(f'   ✅ Full desc: {job_data["title"][:50]}...')
                     except Exception as e:
-                        print(f'   ⚠️  Error parsing job {i}: {e}')
-                        continue
-                
-            except Exception as e:
-                print(f'   ❌ Error during scraping: {e}')
+                        print(f'   ⚠️  Full desc failed for job {i}: {e}')
+                    mark_done(i)
             finally:
-                browser.close()
+                await page.close()
         
-        print(f'✅ Successfully scraped {len(self.jobs)} jobs from Indeed')
-        return self.jobs
+        tabs = min(DESCRIPTION_CONCURRENCY, queue.qsize())
+        if tabs:
+            await asyncio.gather(*(worker() for _ in range(tabs)))
     
-    def parse_job_card_playwright(self, card, page):
+    async def parse_job_card_playwright(self, card, page):
         """Parse a single job card using Playwright selectors"""
         # Extract title
-        title_elem = card.query_selector('h2.jobTitle, .jobTitle span')
+        title_elem = await card.query_selector('h2.jobTitle, .jobTitle span')
         if not title_elem:
             return None
-        title = title_elem.inner_text().strip()
+        title = (await title_elem.inner_text()).strip()
         
         # Extract company
-        company_elem = card.query_selector('[data-testid="company-name"], .companyName')
-        company = company_elem.inner_text().strip() if company_elem else 'Unknown'
+        company_elem = await card.query_selector('[data-testid="company-name"], .companyName')
+        company = (await company_elem.inner_text()).strip() if company_elem else 'Unknown'
         
         # Extract location
-        location_elem = card.query_selector('[data-testid="text-location"], .companyLocation')
-        location = location_elem.inner_text().strip() if location_elem else None
+        location_elem = await card.query_selector('[data-testid="text-location"], .companyLocation')
+        location = (await location_elem.inner_text()).strip() if location_elem else None
         
         # Extract job URL
-        link_elem = card.query_selector('h2.jobTitle a, a.jcs-JobTitle')
+        link_elem = await card.query_selector('h2.jobTitle a, a.jcs-JobTitle')
         if not link_elem:
             return None
         
-        job_url = link_elem.get_attribute('href')
+        job_url = await link_elem.get_attribute('href')
         if not job_url.startswith('http'):
             job_url = self.base_url + job_url
         
@@ -124,15 +278,15 @@ class IndeedPlaywrightScraper:
         job_id = job_id_match.group(1) if job_id_match else hashlib.md5(job_url.encode()).hexdigest()
         
         # Extract salary
-        salary_elem = card.query_selector('.salary-snippet-container, .metadata.salary-snippet-container')
+        salary_elem = await card.query_selector('.salary-snippet-container, .metadata.salary-snippet-container')
         salary_min, salary_max = None, None
         if salary_elem:
-            salary_text = salary_elem.inner_text().strip()
+            salary_text = (await salary_elem.inner_text()).strip()
             salary_min, salary_max = self.clean_salary(salary_text)
         
         # Extract description snippet
-        snippet_elem = card.query_selector('.job-snippet, [data-testid="job-snippet"]')
-        description = snippet_elem.inner_text().strip() if snippet_elem else ''
+        snippet_elem = await card.query_selector('.job-snippet, [data-testid="job-snippet"]')
+        description = (await snippet_elem.inner_text()).strip() if snippet_elem else ''
         
         return {
             'source': 'indeed',
@@ -148,19 +302,17 @@ class IndeedPlaywrightScraper:
             'posted_date': None  # Indeed doesn't always show this on cards
         }
     
-    def fetch_full_description(self, page, job_url):
+    async def fetch_full_description(self, page, job_url):
         """Navigate to a job page and return the full description text."""
-        import time
-        page.goto(job_url, timeout=20000)
-        time.sleep(2)
-        desc_elem = page.query_selector('#jobDescriptionText')
+        await self._goto_ready(page, job_url, DESCRIPTION_SELECTOR, DETAIL_READY_TIMEOUT_MS, 'detail')
+        desc_elem = await page.query_selector('#jobDescriptionText')
         if desc_elem:
-            return desc_elem.inner_text().strip()
+            return (await desc_elem.inner_text()).strip()
         # fallback selectors
         for sel in ['.jobsearch-jobDescriptionText', '[data-testid="jobsearch-JobComponent-description"]']:
-            elem = page.query_selector(sel)
+            elem = await page.query_selector(sel)
             if elem:
-                return elem.inner_text().strip()
+                return (await elem.inner_text()).strip()
         return ''
 
     def clean_salary(self, salary_text):
@@ -201,7 +353,7 @@ if __name__ == '__main__':
     scraper = IndeedPlaywrightScraper()
     jobs = scraper.scrape('Python Developer', 'Portland, OR', max_results=5)
     
-    print(f'\n📊 Results:')
+    print('\n📊 Results:')
     for i, job in enumerate(jobs, 1):
         print(f'\n{i}. {job["title"]}')
         print(f'   Company: {job["company"]}')
@@ -0,0 +1,159 @@
+"""
+Scrape planner
+Builds the full titles × locations × sources task list for a profile and runs
+it concurrently, honouring each source's declared capabilities: its
+concurrency cap (e.g. several Adzuna API calls at once, but only a couple of
+Indeed browsers) and its rate limit. Jobs are streamed back to the caller as
+the scrapers yield them.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import time
+
+
+ScrapeTask = namedtuple('ScrapeTask', 'source scraper_class keywords location max_results verbose since')
+ScrapeResult = namedtuple('ScrapeResult', 'task found error elapsed')
+# One of: a scraped job (job set), a finished task (result set), or an idle tick (neither)
+ScrapeEvent = namedtuple('ScrapeEvent', 'task job result')
+
+_TICK = ScrapeEvent(None, None, None)
+
+
+def plan_scrape(sources, job_titles, locations, max_results=25, verbose=False, marks=None):
+    """
+    Build one task per (source, title, location).
+
+    Args:
+        sources: List of registered scraper classes
+        job_titles: Search keywords, one scrape per title
+        locations: Locations, one scrape per location
+        max_results: Per-task result limit
+        verbose: Passed to sources that declare supports_verbose
+        marks: Optional {query_key: QueryMark} from query_state.load_marks;
+            passed to sources that declare supports_incremental
+
+    Returns:
+        list: ScrapeTask tuples
+    """
+    from .query_state import query_key
+    marks = marks or {}
+    return [ScrapeTask(ScraperClass.name, ScraperClass, title, location, max_results, verbose,
+                       marks.get(query_key(ScraperClass.name, title, location))
+                       if ScraperClass.supports_incremental else None)
+            for ScraperClass in sources
+            for title in job_titles
+            for location in locations]
+
+
+def stream_scrape_plan(tasks, tick_seconds=2.0, buffer_size=500):
+    """
+    Execute scrape tasks concurrently, yielding ScrapeEvents as they happen.
+
+    Each source gets its own worker pool sized by its max_concurrency, so a
+    slow source never starves a fast one of workers, and task starts are
+    spaced out according to its rate_limit. Every job is yielded as soon as
+    its scraper produces it. Each task ends with one event carrying its
+    ScrapeResult, with errors reported there rather than raised. An idle tick
+    (no job, no result) is yielded whenever nothing arrives for tick_seconds,
+    so consumers can flush partial batches. Scrapers block once buffer_size
+    jobs are waiting, and closing the generator stops outstanding work.
+
+    Args:
+        tasks: List of ScrapeTask
+        tick_seconds: Idle interval between ticks
+        buffer_size: Maximum number of undelivered events
+
+    Yields:
+        ScrapeEvent
+    """
+    events = queue.Queue(maxsize=buffer_size)
+    cancelled = threading.Event()
+
+    def put(event):
+        while not cancelled.is_set():
+            try:
+                events.put(event, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    by_source = {}
+    for task in tasks:
+        by_source.setdefault(task.source, []).append(task)
+
+    pools = []
+    try:
+        for source, source_tasks in by_source.items():
+            ScraperClass = source_tasks[0].scraper_class
+            pool = ThreadPoolExecutor(max_workers=max(1, ScraperClass.max_concurrency or 1),
+                                      thread_name_prefix=f'scrape-{source}')
+            pools.append(pool)
+            limiter = _RateLimiter(ScraperClass.rate_limit)
+            for task in source_tasks:
+                pool.submit(_run_task, task, limiter, put)
+
+        remaining = len(tasks)
+        while remaining:
+            try:
+                event = events.get(timeout=tick_seconds)
+            except queue.Empty:
+                yield _TICK
+                continue
+            if event.result is not None:
+                remaining -= 1
+                result = event.result
+                if result.error:
+                    print(f'    {result.task.source} {result.task.keywords} / {result.task.location}: '
+                          f'error {result.error}')
+                else:
+                    print(f'    {result.task.source} {result.task.keywords} / {result.task.location}: '
+                          f'{result.found} found in {result.elapsed:.1f}s')
+            yield event
+    finally:
+        cancelled.set()
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_task(task, limiter, put):
+    """Run one scrape task, streaming its jobs and then its result through put()."""
+    limiter.wait()
+    started = time.monotonic()
+    found = 0
+    error = None
+    try:
+        scraper = task.scraper_class()
+        kwargs = {'since': task.since} if task.since is not None else {}
+        jobs = scraper.iter_jobs(keywords=task.keywords, location=task.location,
+                                 max_results=task.max_results, verbose=task.verbose, **kwargs)
+        for job in jobs:
+            if not put(ScrapeEvent(task, job, None)):
+                if hasattr(jobs, 'close'):
+                    jobs.close()  # consumer went away
+                return
+            found += 1
+    except Exception as e:
+        error = e
+    put(ScrapeEvent(task, None, ScrapeResult(task, found, error, time.monotonic() - started)))
+
+
+class _RateLimiter:
+    """Spaces out calls to wait() to at most `rate` per second across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,89 @@
+"""
+Per-query high-water marks for incremental scraping
+Remembers, for every (source, keywords, location) search, the newest
+posted_date and the most recent external ids it returned. Scrapers that
+declare supports_incremental receive this as a QueryMark and ask the board
+for newest-first results, stopping (or skipping) once they reach postings
+they have already returned, instead of re-fetching the same first pages on
+every run.
+
+Marks are global, like the job_postings catalog, so every profile searching
+the same query benefits; the scrape pipeline copies the postings a mark
+already covers from the catalog to users who don't have them yet. All
+functions need an app context and never commit.
+"""
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+
+KNOWN_IDS_LIMIT = 500  # ids remembered per query
+
+QueryMark = namedtuple('QueryMark', 'newest_posted_at known_ids last_scraped_at')
+
+
+def query_key(source, keywords, location):
+    """Normalised (source, keywords, location) used to store a mark."""
+    return source, (keywords or '').strip().lower(), (location or '').strip().lower()
+
+
+def load_marks(keys):
+    """
+    Fetch the marks for a list of query_key() tuples.
+
+    Returns:
+        dict: {key: QueryMark} for every query scraped before
+    """
+    from models import ScrapeQueryState
+    keys = set(keys)
+    if not keys:
+        return {}
+    rows = (ScrapeQueryState.query
+            .filter(ScrapeQueryState.source.in_({source for source, _, _ in keys}),
+                    ScrapeQueryState.keywords.in_({keywords for _, keywords, _ in keys}))
+            .all())
+    marks = {}
+    for row in rows:
+        key = (row.source, row.keywords, row.location)
+        if key in keys:
+            marks[key] = QueryMark(row.newest_posted_at, frozenset(json.loads(row.known_ids or '[]')),
+                                   row.last_scraped_at)
+    return marks
+
+
+def record_run(key, jobs, found):
+    """
+    Advance a query's mark after a successful run.
+
+    Args:
+        key: query_key() tuple
+        jobs: List of (external_id, posted_date) returned by the run, in order
+        found: Number of jobs the run returned
+    """
+    from models import db, ScrapeQueryState
+    state = ScrapeQueryState.query.filter_by(source=key[0], keywords=key[1], location=key[2]).first()
+    if state is None:
+        state = ScrapeQueryState(source=key[0], keywords=key[1], location=key[2])
+        db.session.add(state)
+
+    ids = list(dict.fromkeys(str(external_id) for external_id, _ in jobs))
+    seen = set(ids)
+    known = ids + [i for i in json.loads(state.known_ids or '[]') if i not in seen]
+    state.known_ids = json.dumps(known[:KNOWN_IDS_LIMIT])
+
+    posted = [p for p in (_utc_naive(posted_date) for _, posted_date in jobs if posted_date) if p]
+    if posted and (state.newest_posted_at is None or max(posted) > state.newest_posted_at):
+        state.newest_posted_at = max(posted)
+    state.last_scraped_at = datetime.utcnow()
+    state.last_found = found
+    return state
+
+
+def _utc_naive(value):
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
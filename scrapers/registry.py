@@ -0,0 +1,85 @@
+"""
+Scraper registry
+Maps source ids to scraper classes. Built-in sources register themselves with
+@register; third-party packages can add sources through the
+'job_search.scrapers' entry-point group. Which sources are used, and in what
+order, comes from the SCRAPER_SOURCES setting.
+"""
+import importlib
+import threading
+
+ENTRY_POINT_GROUP = 'job_search.scrapers'
+BUILTIN_MODULES = ('scrapers.indeed_playwright', 'scrapers.adzuna_api')
+
+_sources = {}
+_unavailable = {}  # source module/entry point -> import error message
+_loaded = False
+_discover_lock = threading.Lock()  # first use can come from worker, scheduler and request threads at once
+
+
+def register(cls):
+    """Class decorator adding a BaseScraper subclass to the registry."""
+    if not cls.name:
+        raise ValueError(f'{cls.__name__} must set a source name to be registered')
+    _sources[cls.name] = cls
+    return cls
+
+
+def load_sources(enabled=None):
+    """
+    Return the available scraper classes.
+
+    Args:
+        enabled: Optional list of source ids; restricts and orders the result
+
+    Returns:
+        dict: {source_id: ScraperClass}
+    """
+    _discover()
+    if enabled is None:
+        return dict(_sources)
+    return {name: _sources[name] for name in enabled if name in _sources}
+
+
+def get_source(name):
+    """Return the scraper class for a source id, or None if unknown/unavailable."""
+    _discover()
+    return _sources.get(name)
+
+
+def unavailable_sources():
+    """Return {module_or_entry_point: error} for sources that failed to import."""
+    _discover()
+    return dict(_unavailable)
+
+
+def _discover():
+    global _loaded
+    if _loaded:
+        return
+    with _discover_lock:
+        if _loaded:
+            return
+        for module in BUILTIN_MODULES:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                _unavailable[module] = str(e)
+        for entry_point in _entry_points():
+            try:
+                register(entry_point.load())
+            except Exception as e:
+                _unavailable[entry_point.name] = str(e)
+        # Only now, so other threads wait for the lock instead of seeing a partial registry
+        _loaded = True
+
+
+def _entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=ENTRY_POINT_GROUP))
+    return list(eps.get(ENTRY_POINT_GROUP, []))
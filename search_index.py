@@ -0,0 +1,165 @@
+"""
+Full-text job search
+Indexes each posting's title, company, location, description and
+requirements in the shared catalog (job_postings), so a posting is indexed
+once however many users have it:
+
+- SQLite: an FTS5 table (jobs_fts) using job_postings as external content.
+  Triggers keep it in sync with inserts, deletes and text edits, including
+  bulk Core inserts and deletes.
+- Postgres: a GIN index on a weighted tsvector expression, which Postgres
+  keeps up to date itself.
+
+The index is created together with the postings table (see models.py), and
+ensure() adds and fills it on an existing database (python migrate_db.py).
+Without it, e.g. on a SQLite build lacking FTS5, search falls back to
+unranked LIKE filters.
+"""
+import re
+
+FTS_TABLE = 'jobs_fts'
+FTS_COLUMNS = ('title', 'company', 'location', 'description', 'requirements')
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0, 1.0)  # bm25 weight per column, same order
+
+# Same expression in the index and the queries, so Postgres can use the index
+TSVECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(company, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(requirements, '')), 'C')"
+)
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{', '.join(FTS_COLUMNS)}, content='job_postings', content_rowid='id', "
+    f"tokenize='porter unicode61 remove_diacritics 2', prefix='3')",
+    f"CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON job_postings BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}); END",
+    f"CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON job_postings BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}); END",
+    f"CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF {', '.join(FTS_COLUMNS)} ON job_postings BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}); END",
+]
+
+_POSTGRES_DDL = [f"CREATE INDEX IF NOT EXISTS ix_job_postings_search ON job_postings USING GIN (({TSVECTOR_SQL}))"]
+
+_available = {}  # engine url -> whether the index exists
+
+
+def create(connection):
+    """
+    Create the index and its triggers on a connection if they don't exist.
+
+    Returns:
+        bool: True if a new SQLite index was created and still needs filling
+    """
+    from sqlalchemy import text
+    dialect = connection.dialect.name
+    _available.pop(str(connection.engine.url), None)
+    if dialect == 'sqlite':
+        existed = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}).first() is not None
+        try:
+            for statement in _SQLITE_DDL:
+                connection.execute(text(statement))
+        except Exception as e:
+            print(f'Full-text search unavailable (SQLite without FTS5?): {e}')
+            return False
+        return not existed
+    if dialect == 'postgresql':
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+    return False
+
+
+def ensure():
+    """Create the index on an existing database and fill it with the stored postings. Commits."""
+    from sqlalchemy import text
+    from models import db
+    with db.engine.begin() as connection:
+        if create(connection):
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            count = connection.execute(text('SELECT COUNT(*) FROM job_postings')).scalar()
+            print(f'   Built full-text index over {count} postings')
+    return available()
+
+
+def available():
+    """Whether the full-text index exists in the current database."""
+    from sqlalchemy import text
+    from models import db
+    url = str(db.engine.url)
+    if url not in _available:
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            _available[url] = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}).first() is not None
+        else:
+            _available[url] = dialect == 'postgresql'
+    return _available[url]
+
+
+def fts_query(text):
+    """
+    Turn free text into a safe FTS5 query: every word must match, and a last
+    word of 3+ characters also matches as a prefix (so results appear while
+    typing; shorter prefixes would expand to most of the vocabulary).
+    Returns '' when the text has no words.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= 3:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(query, text):
+    """
+    Restrict a Job query to jobs whose posting matches free text.
+
+    Args:
+        query: Job query to filter, already joined to JobPosting
+        text: What the user typed
+
+    Returns:
+        tuple: (filtered query, relevance expression where higher is better,
+                or None when results can't be ranked)
+    """
+    from sqlalchemy import func, literal_column, or_, select
+    from sqlalchemy import text as sql_text
+    from models import db, Job, JobPosting
+    if not (text or '').strip():
+        return query, None
+    dialect = db.engine.dialect.name
+
+    if available() and dialect == 'sqlite':
+        match = fts_query(text)
+        if not match:
+            return query, None
+        rank = func.bm25(literal_column(FTS_TABLE), *FTS_WEIGHTS)
+        hits = (select(literal_column('rowid').label('posting_id'), (-rank).label('relevance'))
+                .select_from(sql_text(FTS_TABLE))
+                .where(sql_text(f'{FTS_TABLE} MATCH :fts_query').bindparams(fts_query=match))
+                .subquery('search_hits'))
+        return query.join(hits, hits.c.posting_id == Job.posting_id), hits.c.relevance
+
+    if available() and dialect == 'postgresql':
+        vector = literal_column(TSVECTOR_SQL)
+        terms = func.websearch_to_tsquery('english', text)
+        return query.filter(vector.op('@@')(terms)), func.ts_rank_cd(vector, terms)
+
+    for word in re.findall(r'\w+', text):
+        pattern = f'%{word}%'
+        query = query.filter(or_(JobPosting.title.ilike(pattern), JobPosting.company.ilike(pattern),
+                                 JobPosting.location.ilike(pattern), JobPosting.description.ilike(pattern)))
+    return query, None
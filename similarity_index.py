@@ -0,0 +1,158 @@
+"""
+Resume-to-job similarity index
+Embeds each posting's text as a hashed-feature vector (DIMENSIONS float32
+values, unit length), stored once per posting in posting_vectors, and ranks
+a user's jobs against their active profile with one NumPy matrix-vector
+product. The cosine similarity is stored on each job (Job.similarity), so
+the job list sorts by it through its usual index and keyset pagination.
+
+Words and adjacent word pairs (see ai/prefilter.tokenize) are hashed into
+buckets with a hash-derived sign and sublinear term frequency, weighted by
+field: a posting's title above its body, and the profile's job titles and
+keywords above its resume. Everything runs in process with no model or
+network call, so `flask rescore-similarity` re-ranks every user in seconds.
+
+Functions need an app context and never commit.
+"""
+import hashlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+DIMENSIONS = 1024  # vector width; changing it needs `flask rescore-similarity --reindex`
+TITLE_WEIGHT = 3.0  # job titles / posting title
+KEYWORD_WEIGHT = 2.0  # priority keywords
+
+
+@lru_cache(maxsize=200000)
+def _hash(term):
+    """Stable 64-bit hash of a feature: low bits pick the bucket, the top bit its sign."""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _text_vector(text, weight=1.0):
+    """Unnormalised hashed vector of a text's words and word pairs."""
+    from ai.prefilter import tokenize
+    terms = tokenize(text)
+    counts = Counter(terms)
+    counts.update(f'{a} {b}' for a, b in zip(terms, terms[1:]))
+    if not counts:
+        return np.zeros(DIMENSIONS)
+    hashes = np.fromiter(map(_hash, counts), dtype=np.uint64, count=len(counts))
+    values = weight * (1 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts))))
+    values[(hashes >> np.uint64(63)) == 0] *= -1
+    return np.bincount((hashes % np.uint64(DIMENSIONS)).astype(np.intp), weights=values, minlength=DIMENSIONS)
+
+
+def embed(*fields):
+    """
+    Unit-length float32 vector (all zeros if there is no text) of one or
+    more (text, weight) fields.
+    """
+    vector = sum((_text_vector(text, weight) for text, weight in fields), np.zeros(DIMENSIONS))
+    vector = vector.astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def posting_vector(posting):
+    """Vector of a JobPosting (or anything with its text fields)."""
+    return embed((posting.title, TITLE_WEIGHT), (posting.description, 1.0), (posting.requirements, 1.0))
+
+
+@lru_cache(maxsize=64)
+def _profile_vector(resume_text, keywords, job_titles):
+    vector = embed((resume_text, 1.0), (keywords, KEYWORD_WEIGHT), (job_titles, TITLE_WEIGHT))
+    vector.setflags(write=False)  # shared through the cache
+    return vector
+
+
+def profile_vector(resume_text, prefs=None):
+    """Vector of a candidate's resume, keywords and job titles."""
+    return _profile_vector(resume_text or '',
+                           (prefs.keywords or '') if prefs else '',
+                           (prefs.job_titles or '') if prefs else '')
+
+
+def posting_vectors(postings, chunk_size=500):
+    """
+    Vectors for a list of JobPostings: stored ones are read back, missing
+    ones are computed and stored.
+
+    Returns:
+        dict: {posting_id: vector}
+    """
+    from models import db, PostingVector, insert_or_ignore
+    by_id = {posting.id: posting for posting in postings}
+    ids = list(by_id)
+    vectors = {}
+    for start in range(0, len(ids), chunk_size):
+        for posting_id, blob in (db.session.query(PostingVector.posting_id, PostingVector.vector)
+                                 .filter(PostingVector.posting_id.in_(ids[start:start + chunk_size]))):
+            vectors[posting_id] = np.frombuffer(blob, dtype=np.float32)
+    rows = []
+    for posting_id in ids:
+        if posting_id not in vectors:
+            vectors[posting_id] = posting_vector(by_id[posting_id])
+            rows.append({'posting_id': posting_id, 'vector': vectors[posting_id].tobytes()})
+    for start in range(0, len(rows), chunk_size):
+        insert_or_ignore(PostingVector, rows[start:start + chunk_size], ['posting_id'])
+    return vectors
+
+
+def index_missing(limit=1000):
+    """Compute and store vectors for up to `limit` postings that have none. Returns how many."""
+    from models import db, JobPosting, PostingVector
+    postings = (JobPosting.query
+                .outerjoin(PostingVector, PostingVector.posting_id == JobPosting.id)
+                .filter(PostingVector.posting_id == None)
+                .order_by(JobPosting.id)
+                .limit(limit)
+                .all())
+    posting_vectors(postings)
+    db.session.flush()
+    return len(postings)
+
+
+def score_jobs(jobs, resume_text, prefs=None):
+    """Set similarity on a list of Job objects (e.g. just inserted ones)."""
+    query = profile_vector(resume_text, prefs)
+    if not jobs or not query.any():
+        return
+    vectors = posting_vectors([job.posting for job in jobs])
+    matrix = np.vstack([vectors[job.posting_id] for job in jobs])
+    for job, score in zip(jobs, (matrix @ query).tolist()):
+        job.similarity = round(score, 4)
+
+
+def rescore_user(user_id, resume_text, prefs=None):
+    """
+    Recompute similarity for all of a user's jobs against their profile in
+    one matrix product (after the profile or resume changes).
+
+    Returns:
+        int: number of jobs scored
+    """
+    from models import db, Job, JobPosting, PostingVector
+    query = profile_vector(resume_text, prefs)
+    if not query.any():
+        return 0
+    missing = (JobPosting.query
+               .join(Job, Job.posting_id == JobPosting.id)
+               .outerjoin(PostingVector, PostingVector.posting_id == JobPosting.id)
+               .filter(Job.user_id == user_id, PostingVector.posting_id == None)
+               .all())
+    posting_vectors(missing)
+
+    rows = (db.session.query(Job.id, PostingVector.vector)
+            .join(PostingVector, PostingVector.posting_id == Job.posting_id)
+            .filter(Job.user_id == user_id)
+            .all())
+    if not rows:
+        return 0
+    matrix = np.frombuffer(b''.join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), DIMENSIONS)
+    scores = (matrix @ query).tolist()
+    db.session.execute(db.update(Job), [{'id': job_id, 'similarity': round(score, 4)}
+                                        for (job_id, _), score in zip(rows, scores)])
+    return len(rows)
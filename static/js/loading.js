@@ -21,7 +21,8 @@ class LoadingOverlay {
                     <div style="position:absolute;inset:0;border:3px solid #ddd8d0;border-radius:50%;"></div>
                     <div style="position:absolute;inset:0;border:3px solid #c84b2f;border-radius:50%;border-top-color:transparent;animation:spin 0.8s linear infinite;"></div>
                 </div>
-                <div style="font-family:'DM Mono',monospace;font-size:12px;letter-spacing:0.06em;color:#6b6560;text-transform:uppercase;">${message}</div>
+                <div class="loading-message" style="font-family:'DM Mono',monospace;font-size:12px;letter-spacing:0.06em;color:#6b6560;text-transform:uppercase;">${message}</div>
+                <div class="loading-detail" style="font-family:'DM Mono',monospace;font-size:11px;letter-spacing:0.04em;color:#9a948c;"></div>
             </div>
             <style>@keyframes spin{to{transform:rotate(360deg)}}</style>
         `;
@@ -40,12 +41,21 @@ class LoadingOverlay {
 
     update(message) {
         if (this.overlay) {
-            const messageEl = this.overlay.querySelector('.text-gray-200');
+            const messageEl = this.overlay.querySelector('.loading-message');
             if (messageEl) {
                 messageEl.textContent = message;
             }
         }
     }
+
+    detail(text) {
+        if (this.overlay) {
+            const detailEl = this.overlay.querySelector('.loading-detail');
+            if (detailEl) {
+                detailEl.textContent = text;
+            }
+        }
+    }
 }
 
 // Global instance
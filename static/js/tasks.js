@@ -0,0 +1,100 @@
+/**
+ * Background Task Progress
+ * Scrape endpoints queue a task and return its id right away.
+ * waitForTask() follows it over its own /api/events stream (Server-Sent
+ * Events), closed once the task finishes, falling back to polling
+ * /api/tasks/<id> without EventSource.
+ */
+
+function taskEvents(taskId) {
+    return new EventSource(`/api/events?task=${taskId}`);
+}
+
+function fetchTask(taskId) {
+    return fetch(`/api/tasks/${taskId}`).then(r => r.json());
+}
+
+function pollTask(taskId, { interval = 2000, onProgress } = {}) {
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetchTask(taskId)
+                .then(data => {
+                    if (!data.success) return reject(new Error(data.message));
+                    if (data.status === 'done' || data.status === 'failed') return resolve(data);
+                    if (onProgress && data.progress) onProgress(data.progress);
+                    setTimeout(poll, interval);
+                })
+                .catch(reject);
+        };
+        poll();
+    });
+}
+
+/**
+ * Resolve with the task's status payload once it finishes.
+ * onProgress(totals) receives running totals; onSearch(search) one
+ * finished source/title/location search.
+ */
+function waitForTask(taskId, options = {}) {
+    if (!window.EventSource) return pollTask(taskId, options);
+    const { onProgress, onSearch } = options;
+
+    return new Promise((resolve, reject) => {
+        const source = taskEvents(taskId);
+        let settled = false;
+
+        const finish = (fn, value) => {
+            if (settled) return;
+            settled = true;
+            source.close();
+            fn(value);
+        };
+        const on = (name, fn) => {
+            source.addEventListener(name, e => {
+                const data = JSON.parse(e.data);
+                if (data.task_id === taskId) fn(data);
+            });
+        };
+        const finished = () => {
+            // The server ends the stream now; close it before the browser reconnects
+            source.close();
+            fetchTask(taskId).then(task => finish(resolve, task)).catch(err => finish(reject, err));
+        };
+
+        on('progress', data => onProgress && onProgress(data));
+        on('search', data => onSearch && onSearch(data));
+        on('done', finished);
+        on('failed', finished);
+        source.addEventListener('error', () => {
+            if (source.readyState === EventSource.CLOSED && !settled) pollTask(taskId, options).then(
+                task => finish(resolve, task), err => finish(reject, err));
+        });
+
+        // The task may have finished before the stream connected
+        fetchTask(taskId).then(task => {
+            if (task.status === 'done' || task.status === 'failed') finish(resolve, task);
+        });
+    });
+}
+
+/**
+ * Start a task-returning request and resolve with the finished task's
+ * status: { success, message, ... } like the old synchronous responses.
+ */
+function runTask(url, options = {}, taskOptions = {}) {
+    return fetch(url, options)
+        .then(r => r.json())
+        .then(data => {
+            if (!data.success || !data.task_id) return data;
+            return waitForTask(data.task_id, taskOptions)
+                .then(task => ({ ...(task.result || {}), ...task, success: task.status === 'done' }));
+        });
+}
+
+function describeProgress(p) {
+    return `${p.searches_done}/${p.searches} searches · ${p.found} found · ${p.saved} new · ${p.scored} scored`;
+}
+
+window.waitForTask = waitForTask;
+window.runTask = runTask;
+window.describeProgress = describeProgress;
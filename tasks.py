@@ -0,0 +1,313 @@
+"""
+Background task queue
+Database-backed queue for long-running work such as scrapes, so web requests
+only record a task and return its id. Works on the app's own database
+(SQLite or Postgres) with no external broker.
+
+Workers claim tasks with a conditional UPDATE, so several worker threads or
+processes can poll the same table without running a task twice. While a task
+is queued or running it holds a dedupe key, so submitting the same work again
+returns the existing task instead of starting a second one. Handlers report
+progress through a callback, which also serves as the task's heartbeat: a
+running task whose worker stops reporting for TASK_STALE_SECONDS is requeued.
+
+Run workers with `flask run-worker`, or let the web process start an embedded
+worker thread (TASK_WORKER_EMBEDDED, the default for development).
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+MAX_ATTEMPTS = 2  # a task orphaned by a dead worker is retried once
+
+_embedded = []
+_embedded_lock = threading.Lock()
+
+
+def enqueue(kind, payload, user_id=None, dedupe=True):
+    """
+    Queue a task, or return the identical task already queued/running.
+
+    Args:
+        kind: Handler name, e.g. 'scrape'
+        payload: JSON-serialisable handler arguments
+        user_id: Owner of the task
+        dedupe: Reuse an identical unfinished task instead of queuing another
+
+    Returns:
+        tuple: (task: BackgroundTask, created: bool)
+    """
+    from models import db, BackgroundTask, insert_or_ignore
+    body = json.dumps(payload, sort_keys=True)
+    key = _dedupe_key(kind, user_id, body) if dedupe else None
+    row = {'kind': kind, 'payload': body, 'user_id': user_id, 'dedupe_key': key,
+           'status': QUEUED, 'attempts': 0, 'created_at': datetime.utcnow()}
+    for _ in range(3):
+        inserted = insert_or_ignore(BackgroundTask, [row], ['dedupe_key'],
+                                    returning=[BackgroundTask.id]).all()
+        if inserted:
+            db.session.commit()
+            return db.session.get(BackgroundTask, inserted[0][0]), True
+        existing = BackgroundTask.query.filter_by(dedupe_key=key).first()
+        if existing is not None:
+            db.session.commit()
+            return existing, False
+        # The duplicate finished between the insert and the lookup; try again
+    raise RuntimeError(f'Could not enqueue {kind} task')
+
+
+def get_task(task_id, user_id=None):
+    """Return a task by id, optionally restricted to one owner."""
+    from models import BackgroundTask
+    query = BackgroundTask.query.filter_by(id=task_id)
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return query.first()
+
+
+def unfinished_task_ids(user_id, task_ids=None):
+    """Ids of a user's queued or running tasks, optionally only among task_ids."""
+    from models import db, BackgroundTask
+    query = db.session.query(BackgroundTask.id).filter(BackgroundTask.user_id == user_id,
+                                                        BackgroundTask.status.in_([QUEUED, RUNNING]))
+    if task_ids:
+        query = query.filter(BackgroundTask.id.in_(task_ids))
+    return {task_id for (task_id,) in query}
+
+
+def task_info(task):
+    """Serialise a task for the status API."""
+    return {
+        'task_id': task.id,
+        'kind': task.kind,
+        'status': task.status,
+        'progress': json.loads(task.progress) if task.progress else None,
+        'result': json.loads(task.result) if task.result else None,
+        'error': task.error,
+        'created_at': task.created_at.isoformat() if task.created_at else None,
+        'started_at': task.started_at.isoformat() if task.started_at else None,
+        'finished_at': task.finished_at.isoformat() if task.finished_at else None,
+    }
+
+
+def task_changes(user_id, seen, since):
+    """
+    Compare a user's tasks against `seen` and return the events a stream has
+    missed, for workers running in another process (whose in-process events
+    never reach this one). seen maps task id -> (status, progress) and is
+    updated in place; tasks finished before `since` are ignored.
+
+    Returns:
+        list: (event, data) tuples
+    """
+    from models import db, BackgroundTask
+    tasks = (BackgroundTask.query
+             .filter(BackgroundTask.user_id == user_id,
+                     db.or_(BackgroundTask.status.in_([QUEUED, RUNNING]),
+                            BackgroundTask.finished_at >= since))
+             .all())
+    changes = []
+    for task in tasks:
+        state = (task.status, task.progress)
+        if seen.get(task.id, (None, None))[0] in (DONE, FAILED) or seen.get(task.id) == state:
+            continue
+        seen[task.id] = state
+        if task.status == DONE:
+            result = json.loads(task.result) if task.result else {}
+            changes.append((DONE, dict(result, task_id=task.id, kind=task.kind)))
+        elif task.status == FAILED:
+            changes.append((FAILED, {'task_id': task.id, 'kind': task.kind, 'message': task.error}))
+        elif task.progress:
+            changes.append(('progress', dict(json.loads(task.progress), task_id=task.id, kind=task.kind)))
+    return changes
+
+
+def claim(worker_id):
+    """
+    Atomically take the oldest queued task and mark it running.
+
+    Returns:
+        BackgroundTask or None if the queue is empty
+    """
+    from models import db, BackgroundTask
+    while True:
+        candidate = (db.session.query(BackgroundTask.id)
+                     .filter(BackgroundTask.status == QUEUED)
+                     .order_by(BackgroundTask.id)
+                     .limit(1)
+                     .scalar())
+        if candidate is None:
+            db.session.rollback()
+            return None
+        now = datetime.utcnow()
+        claimed = (BackgroundTask.query
+                   .filter(BackgroundTask.id == candidate, BackgroundTask.status == QUEUED)
+                   .update({BackgroundTask.status: RUNNING,
+                            BackgroundTask.worker: worker_id,
+                            BackgroundTask.started_at: now,
+                            BackgroundTask.heartbeat_at: now,
+                            BackgroundTask.attempts: BackgroundTask.attempts + 1},
+                           synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            return db.session.get(BackgroundTask, candidate)
+        # Another worker won the race for this row; look again
+
+
+def report_progress(task_id, worker_id, **progress):
+    """
+    Store handler progress and refresh the task's heartbeat, unless the task
+    was requeued and is no longer worker_id's. Commits.
+    """
+    from models import db, BackgroundTask
+    (BackgroundTask.query
+     .filter(BackgroundTask.id == task_id, BackgroundTask.status == RUNNING,
+             BackgroundTask.worker == worker_id)
+     .update({BackgroundTask.progress: json.dumps(progress),
+              BackgroundTask.heartbeat_at: datetime.utcnow()},
+             synchronize_session=False))
+    db.session.commit()
+
+
+def finish(task_id, result=None, error=None, worker_id=None):
+    """
+    Mark a task done (or failed if error is given) and release its dedupe key.
+    With worker_id, only while that worker still owns the running task, so a
+    worker whose task was requeued as stale can't overwrite the new owner's
+    state. Commits.
+
+    Returns:
+        bool: whether the task was updated
+    """
+    from models import db, BackgroundTask
+    query = BackgroundTask.query.filter(BackgroundTask.id == task_id)
+    if worker_id is not None:
+        query = query.filter(BackgroundTask.status == RUNNING, BackgroundTask.worker == worker_id)
+    updated = (query
+     .update({BackgroundTask.status: FAILED if error else DONE,
+              BackgroundTask.result: json.dumps(result) if result is not None else None,
+              BackgroundTask.error: error,
+              BackgroundTask.dedupe_key: None,
+              BackgroundTask.finished_at: datetime.utcnow()},
+             synchronize_session=False))
+    db.session.commit()
+    return bool(updated)
+
+
+def requeue_stale(stale_after):
+    """
+    Recover tasks whose worker died: running tasks with no heartbeat for
+    stale_after seconds go back to the queue, or fail after MAX_ATTEMPTS.
+
+    Returns:
+        int: Number of tasks recovered
+    """
+    from models import db, BackgroundTask
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    stale = (BackgroundTask.query
+             .filter(BackgroundTask.status == RUNNING, BackgroundTask.heartbeat_at < cutoff)
+             .all())
+    for task in stale:
+        if task.attempts >= MAX_ATTEMPTS:
+            task.status = FAILED
+            task.error = f'Worker stopped responding after {task.attempts} attempts'
+            task.dedupe_key = None
+            task.finished_at = datetime.utcnow()
+        else:
+            task.status = QUEUED
+    db.session.commit()
+    return len(stale)
+
+
+def run_worker(app, handlers, stop=None, poll_interval=1.0, once=False):
+    """
+    Claim and run tasks until stop is set (or the queue is empty, with once).
+
+    Each handler is called as handler(payload, progress). progress(**info)
+    stores a cumulative progress snapshot (and heartbeat) and
+    progress(event, **info) publishes any other named event; both are pushed
+    to the owner's open event streams. The handler's return value is stored
+    as the task result and any exception marks the task failed.
+
+    Args:
+        app: Flask app, for the app context tasks run in
+        handlers: {kind: handler}
+        stop: Optional threading.Event that ends the loop
+        poll_interval: Seconds to sleep when the queue is empty
+        once: Return as soon as the queue is empty
+    """
+    stop = stop or threading.Event()
+    worker_id = f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+    stale_after = app.config['TASK_STALE_SECONDS']
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                recovered = requeue_stale(stale_after)
+                if recovered:
+                    print(f'   ♻️  Recovered {recovered} stale task(s)')
+                task = claim(worker_id)
+            except Exception as e:
+                print(f'Task queue error: {e}')
+                task = None
+            if task is None:
+                if once:
+                    return
+                stop.wait(poll_interval)
+                continue
+            _execute(task, handlers)
+
+
+def start_embedded_worker(app, handlers, threads=1):
+    """Start worker threads inside this process, once. Returns the stop event."""
+    with _embedded_lock:
+        if not _embedded:
+            stop = threading.Event()
+            for n in range(threads):
+                threading.Thread(target=run_worker, args=(app, handlers, stop),
+                                 name=f'task-worker-{n}', daemon=True).start()
+            _embedded.append(stop)
+        return _embedded[0]
+
+
+def _execute(task, handlers):
+    from models import db
+    from events import publish
+    task_id, kind, user_id, worker_id = task.id, task.kind, task.user_id, task.worker
+    handler = handlers.get(kind)
+    if handler is None:
+        finish(task_id, error=f'No handler for task kind {kind!r}', worker_id=worker_id)
+        publish(user_id, FAILED, {'task_id': task_id, 'kind': kind, 'message': f'No handler for {kind}'})
+        return
+
+    def progress(event='progress', **info):
+        publish(user_id, event, dict(info, task_id=task_id, kind=kind))
+        if event == 'progress':
+            report_progress(task_id, worker_id, **info)
+
+    print(f'▶️  Task {task_id} ({kind}) started')
+    publish(user_id, 'started', {'task_id': task_id, 'kind': kind})
+    try:
+        result = handler(json.loads(task.payload or '{}'), progress)
+    except Exception as e:
+        db.session.rollback()
+        print(f'❌ Task {task_id} ({kind}) failed: {e}')
+        if finish(task_id, error=str(e), worker_id=worker_id):
+            publish(user_id, FAILED, {'task_id': task_id, 'kind': kind, 'message': str(e)})
+        return
+    if not finish(task_id, result=result, worker_id=worker_id):
+        print(f'⚠️  Task {task_id} ({kind}) was requeued while running; result discarded')
+        return
+    publish(user_id, DONE, dict(result or {}, task_id=task_id, kind=kind))
+    print(f'✅ Task {task_id} ({kind}) done')
+
+
+def _dedupe_key(kind, user_id, body):
+    return hashlib.sha256(f'{kind}\x00{user_id}\x00{body}'.encode('utf-8')).hexdigest()
@@ -0,0 +1,54 @@
+"""
+Shared fixtures: the app on a throwaway SQLite database. DATABASE_URL is
+set before app is imported, since config reads it at import time.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix='jobsearch-tests-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_DB_DIR, "test.db")}'
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The Flask app with the schema (and full-text index) created. Used by pytest-flask's client."""
+    from app import app as flask_app
+    from models import db
+    import search_index
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.create_all()
+        search_index.ensure()
+        yield flask_app
+        db.session.remove()
+        db.engine.dispose()
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def query_plan(app):
+    """Returns plan(query): EXPLAIN QUERY PLAN of a SQLAlchemy query, one detail line per step."""
+    from models import db
+
+    def plan(query):
+        sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        return [row[3] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))]
+    return plan
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements (with their parameters) executed while the test runs."""
+    from sqlalchemy import event
+    from models import db
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, repr(parameters)))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,80 @@
+"""
+Task progress streaming: an /api/events stream ends once the tasks it
+follows finish, and a subscriber that falls behind only loses progress
+events.
+"""
+import pytest
+
+from events import ProgressBroker, broker
+from models import db, User
+from tasks import enqueue, DONE
+
+MAX_CHUNKS = 10  # a stream that never ends keeps sending keepalives
+
+
+@pytest.fixture(scope='module')
+def user(app):
+    user = User(username='events', email='events@example.com')
+    user.set_password('password1')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def stream(app, client, user, monkeypatch):
+    """Open /api/events as the user; returns an iterator over its chunks."""
+    monkeypatch.setitem(app.config, 'EVENT_STREAM_KEEPALIVE_SECONDS', 1)
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    def open_stream(query=''):
+        response = client.get(f'/api/events{query}', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        return iter(response.response)
+    return open_stream
+
+
+def _read_to_end(chunks):
+    read = []
+    for chunk in chunks:
+        read.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+        assert len(read) < MAX_CHUNKS, f'stream did not end: {read}'
+    return ''.join(read)
+
+
+def test_stream_ends_when_its_task_finishes(user, stream):
+    task, _ = enqueue('scrape', {'stream': 'test'}, user_id=user.id, dedupe=False)
+    other, _ = enqueue('scrape', {'stream': 'other'}, user_id=user.id, dedupe=False)
+    chunks = stream(f'?task={task.id}')
+    assert next(chunks).startswith(b'retry:')
+
+    broker.publish(user.id, 'progress', {'task_id': other.id, 'found': 9})
+    broker.publish(user.id, 'progress', {'task_id': task.id, 'found': 1})
+    broker.publish(user.id, DONE, {'task_id': task.id, 'kind': 'scrape'})
+    body = _read_to_end(chunks)
+
+    assert 'event: progress' in body and '"found": 1' in body
+    assert 'event: done' in body
+    assert '"found": 9' not in body
+    assert broker.subscriber_count() == 0
+
+
+def test_stream_without_unfinished_tasks_ends_at_once(stream):
+    chunks = stream('?task=999999')
+    assert next(chunks).startswith(b'retry:')
+    assert _read_to_end(chunks) == ''
+
+
+def test_backed_up_subscriber_only_loses_progress():
+    progress_broker = ProgressBroker(queue_size=2)
+    events = progress_broker.subscribe(1)
+    for found in range(5):
+        progress_broker.publish(1, 'progress', {'found': found})
+    progress_broker.publish(1, 'search', {'found': 5})
+    progress_broker.publish(1, DONE, {'found': 5})
+
+    received = [events.get_nowait() for _ in range(events.qsize())]
+    assert [event for event, _ in received] == ['progress', 'progress', 'search', DONE]
+    assert [data['found'] for _, data in received] == [0, 1, 5, 5]
@@ -0,0 +1,67 @@
+"""
+Per-page SQL statement counts: each page stays within its query budget and
+never runs the same statement twice with the same parameters (the shape of
+an N+1 loop or a lookup the request should have memoised).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, User, Job, Application, Interview, SearchPreferences, Resume, bulk_insert_jobs
+
+# Statements per page for a user with jobs, applications and an interview.
+# They must not grow with the number of rows shown.
+PAGE_QUERY_BUDGET = {
+    '/': 6,
+    '/applications': 11,
+    '/calendar': 7,
+    '/analytics': 5,
+    '/settings': 6,
+    '/job/{job_id}': 7,
+}
+
+
+@pytest.fixture(scope='module')
+def user(app):
+    """A user with a profile, resume, 30 jobs, applications in each column and an interview."""
+    import user_stats
+    user = User(username='pages', email='pages@example.com')
+    user.set_password('password1')
+    db.session.add(user)
+    db.session.flush()
+    prefs = SearchPreferences(user_id=user.id, name='Default', is_active=True,
+                              job_titles='Python Developer', keywords='django', locations='Portland, OR')
+    db.session.add(prefs)
+    db.session.flush()
+    db.session.add(Resume(profile_id=prefs.id, content='Python and Django developer'))
+    jobs, _ = bulk_insert_jobs([{'source': 'adzuna', 'external_id': f'page-{i}', 'url': f'https://example.com/{i}',
+                                 'title': f'Python Developer {i}', 'company': f'Company {i}',
+                                 'location': 'Portland, OR', 'description': 'Python and Django role'}
+                                for i in range(30)], user_id=user.id, match_score=80)
+    statuses = ['applied', 'interview', 'rejected', 'offer', 'not_interested']
+    applications = [Application(job_id=job.id, status=status, applied_date=datetime.utcnow() - timedelta(days=i))
+                    for i, (job, status) in enumerate(zip(jobs, statuses * 2))]
+    db.session.add_all(applications)
+    db.session.flush()
+    db.session.add(Interview(application_id=applications[1].id, scheduled_date=datetime.utcnow() + timedelta(days=2),
+                             interview_type='video'))
+    user_stats.rebuild(user.id)
+    db.session.commit()
+    return user
+
+
+@pytest.mark.parametrize('page', list(PAGE_QUERY_BUDGET))
+def test_page_query_count(app, client, user, statements, page):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    url = page.format(job_id=Job.query.filter_by(user_id=user.id).first().id)
+    statements.clear()
+    with app.app_context():  # fresh flask.g, as in a served request
+        response = client.get(url)
+
+    assert response.status_code == 200
+    repeated = sorted({' '.join(statement.split()) for statement, parameters in statements
+                       if statements.count((statement, parameters)) > 1})
+    assert not repeated
+    assert len(statements) <= PAGE_QUERY_BUDGET[page], [' '.join(statement.split())[:150] for statement, _ in statements]
@@ -0,0 +1,58 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot page queries: no full scan of the big
+tables, and the job list reads rows in index order instead of sorting them.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import user_stats
+from app import JOB_LIST_SORTS, _application_board_queries, _job_list_query
+from models import db, Job, SearchPreferences, keyset_seek
+
+HOT_TABLES = ('jobs', 'job_postings', 'applications', 'interviews', 'search_preferences', 'resume')
+
+
+def _full_scans(plan):
+    return [line for line in plan if line.startswith('SCAN ') and line.split()[1] in HOT_TABLES]
+
+
+def _temp_sorts(plan):
+    return [line for line in plan if 'USE TEMP B-TREE' in line]
+
+
+@pytest.mark.parametrize('sort_by', list(JOB_LIST_SORTS))
+def test_job_list_first_page_uses_index(query_plan, sort_by):
+    plan = query_plan(_job_list_query(0, sort_by=sort_by)[0].limit(20))
+    assert not _full_scans(plan), plan
+    assert not _temp_sorts(plan), plan
+
+
+@pytest.mark.parametrize('sort_by', list(JOB_LIST_SORTS))
+def test_job_list_next_page_uses_index(query_plan, sort_by):
+    keys = JOB_LIST_SORTS[sort_by]
+    values = [False if column is Job.starred else datetime.utcnow() if isinstance(column.type, db.DateTime)
+              else 50 for column, _ in keys]
+    plan = query_plan(_job_list_query(0, sort_by=sort_by)[0].filter(keyset_seek(keys, values)).limit(21))
+    assert not _full_scans(plan), plan
+    assert not _temp_sorts(plan), plan
+
+
+@pytest.mark.parametrize('filters', [{'source': 'adzuna'}, {'min_score': 80}])
+def test_filtered_job_list_uses_index(query_plan, filters):
+    plan = query_plan(_job_list_query(0, **filters)[0].limit(20))
+    assert not _full_scans(plan), plan
+    assert not _temp_sorts(plan), plan
+
+
+def test_other_hot_queries_do_not_scan(query_plan):
+    # These may sort their (already narrowed) rows; they must not read whole tables
+    queries = {
+        'jobs search': _job_list_query(0, sort_by='relevance', q='python developer')[0].limit(20),
+        'job stats rebuild': user_stats.stats_query(0),
+        'active profile': SearchPreferences.query.filter_by(user_id=0, is_active=True),
+    }
+    queries.update((f'applications board ({column})', query) for column, query
+                   in _application_board_queries(0, datetime.utcnow() - timedelta(weeks=3)).items())
+    scans = {name: _full_scans(query_plan(query)) for name, query in queries.items()}
+    assert not {name: lines for name, lines in scans.items() if lines}
@@ -0,0 +1,28 @@
+"""
+Task ownership: once a stale task is requeued and claimed by another
+worker, the original worker can no longer report progress or finish it.
+"""
+import json
+
+from models import db, BackgroundTask
+from tasks import enqueue, finish, report_progress, RUNNING, DONE
+
+
+def test_requeued_task_belongs_to_its_new_worker(app):
+    task, _ = enqueue('scrape', {'owner': 'test'}, dedupe=False)
+    # Claimed by worker-a, requeued as stale, then claimed again by worker-b
+    BackgroundTask.query.filter_by(id=task.id).update({'status': RUNNING, 'worker': 'worker-b'})
+    db.session.commit()
+
+    report_progress(task.id, 'worker-a', found=1)
+    assert not finish(task.id, result={'saved': 1}, worker_id='worker-a')
+    task = db.session.get(BackgroundTask, task.id)
+    db.session.refresh(task)
+    assert (task.status, task.progress) == (RUNNING, None)
+
+    report_progress(task.id, 'worker-b', found=2)
+    assert finish(task.id, result={'saved': 2}, worker_id='worker-b')
+    db.session.refresh(task)
+    assert task.status == DONE
+    assert json.loads(task.progress) == {'found': 2}
+    assert json.loads(task.result) == {'saved': 2}
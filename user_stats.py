@@ -0,0 +1,155 @@
+"""
+Per-user materialised dashboard counters
+The dashboard, analytics page and footer read their counters from one
+user_stats row (plus one user_source_stats row per source) instead of
+aggregating over every job the user has. Code that adds, deletes, stars or
+re-scores jobs, or changes an application's status, reports the change with
+adjust(), which applies it as a relative UPDATE in the caller's transaction.
+
+A user's rows are rebuilt from the jobs table the first time they are read,
+and `flask rebuild-stats` repairs any drift (e.g. from manual SQL). Functions
+never commit unless their docstring says so.
+"""
+from collections import Counter, namedtuple
+from datetime import datetime
+
+HIGH_MATCH_SCORE = 80
+SUBMITTED_STATUSES = ('applied', 'interview', 'rejected', 'offer')
+STATUS_COUNTERS = ('applied', 'interview', 'offer', 'rejected')
+COUNTERS = ('total', 'high_match', 'starred') + STATUS_COUNTERS + ('submitted',)
+
+# What a job contributes to the counters
+JobState = namedtuple('JobState', 'source match_score status starred')
+
+
+def snapshot(job, status=None):
+    """JobState for a Job; status defaults to its application's current status."""
+    if status is None and job.application is not None:
+        status = job.application.status
+    return JobState(job.source, job.match_score, status, bool(job.starred))
+
+
+def contribution(state):
+    """Counter increments one job in the given state accounts for."""
+    counts = {'total': 1}
+    if state.match_score is not None and state.match_score >= HIGH_MATCH_SCORE:
+        counts['high_match'] = 1
+    if state.starred:
+        counts['starred'] = 1
+    if state.status in STATUS_COUNTERS:
+        counts[state.status] = 1
+    if state.status in SUBMITTED_STATUSES:
+        counts['submitted'] = 1
+    return counts
+
+
+def adjust(user_id, removed=(), added=()):
+    """
+    Apply the difference between job states to a user's counters.
+
+    Pass a job's state before a change in removed and after it in added
+    (only removed for a deletion, only added for an insert). Users whose
+    counters have not been built yet are skipped; they are built from the
+    jobs table on first read.
+
+    Args:
+        user_id: Owner of the jobs
+        removed: JobStates that no longer count
+        added: JobStates that now count
+    """
+    from models import UserStats, UserSourceStats, insert_or_ignore
+    if user_id is None:
+        return
+    delta = Counter()
+    by_source = Counter()
+    for sign, states in ((-1, removed), (1, added)):
+        for state in states:
+            for key, value in contribution(state).items():
+                delta[key] += sign * value
+            by_source[state.source] += sign
+    delta = {key: value for key, value in delta.items() if value}
+    by_source = {source: value for source, value in by_source.items() if value}
+    if not delta and not by_source:
+        return
+
+    exists = (UserStats.query
+              .filter(UserStats.user_id == user_id)
+              .update({getattr(UserStats, key): getattr(UserStats, key) + value for key, value in delta.items()}
+                      or {UserStats.user_id: UserStats.user_id},
+                      synchronize_session=False))
+    if not exists:
+        return
+    if by_source:
+        insert_or_ignore(UserSourceStats, [{'user_id': user_id, 'source': source, 'jobs': 0}
+                                           for source in by_source], ['user_id', 'source'])
+        for source, value in by_source.items():
+            (UserSourceStats.query
+             .filter(UserSourceStats.user_id == user_id, UserSourceStats.source == source)
+             .update({UserSourceStats.jobs: UserSourceStats.jobs + value}, synchronize_session=False))
+
+
+def get(user_id):
+    """
+    Return a user's counters, building (and committing) them first if they
+    don't exist yet.
+
+    Returns:
+        dict: one entry per COUNTERS name plus by_source {source: count}
+    """
+    from models import db, UserStats, UserSourceStats
+    row = db.session.get(UserStats, user_id)
+    if row is None:
+        rebuild(user_id)
+        db.session.commit()
+        row = db.session.get(UserStats, user_id)
+    stats = {key: getattr(row, key) for key in COUNTERS}
+    stats['by_source'] = {source: jobs for source, jobs in
+                          db.session.query(UserSourceStats.source, UserSourceStats.jobs)
+                          .filter(UserSourceStats.user_id == user_id, UserSourceStats.jobs > 0)
+                          .order_by(UserSourceStats.source)}
+    return stats
+
+
+def stats_query(user_id):
+    """
+    Grouped aggregate over a user's jobs and applications, one row per source:
+    (source, total, high_match, starred, applied, interview, offer, rejected, submitted).
+    """
+    from models import db, Job, Application
+
+    def count_if(condition):
+        return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+    return (db.session.query(
+                Job.source,
+                db.func.count(db.distinct(Job.id)),
+                count_if(Job.match_score >= HIGH_MATCH_SCORE),
+                count_if(Job.starred == True),
+                *(count_if(Application.status == status) for status in STATUS_COUNTERS),
+                count_if(Application.status.in_(SUBMITTED_STATUSES)),
+            )
+            .outerjoin(Application, Application.job_id == Job.id)
+            .filter(Job.user_id == user_id)
+            .group_by(Job.source))
+
+
+def rebuild(user_id):
+    """Recompute a user's counters from the jobs table."""
+    from models import db, UserStats, UserSourceStats
+    totals = dict.fromkeys(COUNTERS, 0)
+    by_source = {}
+    for source, *values in stats_query(user_id).all():
+        by_source[source] = values[0]
+        for key, value in zip(COUNTERS, values):
+            totals[key] += int(value)
+
+    row = db.session.get(UserStats, user_id) or UserStats(user_id=user_id)
+    for key, value in totals.items():
+        setattr(row, key, value)
+    row.rebuilt_at = datetime.utcnow()
+    db.session.add(row)
+    UserSourceStats.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.session.add_all(UserSourceStats(user_id=user_id, source=source, jobs=jobs)
+                       for source, jobs in by_source.items())
+    db.session.flush()
+    return totals, by_source